@@ -1,15 +1,23 @@
 from fastapi import APIRouter, Depends, HTTPException
-from typing import Any, Dict, Optional
-import base64
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from typing import Any, Dict, List, Optional
+import asyncio
+import io
+import traceback
+import uuid
+import numpy as np
 from pydantic import BaseModel
 
 from app.api import deps
 from app.models.user import User
 from app.schemas.architecture import ArchitecturalProgram
-from app.core.templates import template_service, LayoutTemplate
+from app.core.templates import template_service
 from app.core.graph import graph_builder
 from app.services.ml_inference import ml_service
-from app.services.geometry import geometry_service
+from app.services.geometry import geometry_service, GeometryBatch
+from app.core.cache import cache
+from app.config import settings
 
 router = APIRouter()
 
@@ -17,9 +25,12 @@ class GenerationResponse(BaseModel):
     template_id: str
     template_name: str
     svg_content: str
-    glb_content: Optional[str] = None # Base64 encoded GLB file
+    job_id: Optional[str] = None # Fetch the GLB model from /generation/{job_id}/glb
     metadata: Dict[str, Any]
 
+class BatchGenerationRequest(BaseModel):
+    programs: List[ArchitecturalProgram]
+
 @router.post("/baseline", response_model=GenerationResponse)
 async def generate_baseline_layout(
     program: ArchitecturalProgram,
@@ -28,55 +39,40 @@ async def generate_baseline_layout(
     """
     Generate a baseline layout using deterministic template matching.
     This serves as a fallback or quick-start option before full AI generation.
+    CPU-bound steps run in the threadpool so they don't block the event loop.
     """
     try:
         # Find best matching template
-        template = template_service.find_best_match(program)
+        template = await run_in_threadpool(template_service.find_best_match, program)
         
         if not template:
             raise HTTPException(status_code=404, detail="No suitable template found for the given program constraints.")
             
         # Generate SVG visualization
-        svg_output = template_service.render_svg(template)
+        svg_output = await run_in_threadpool(template_service.render_svg, template)
         
         # Generate 3D Model (GLB) from Template Rooms
-        # Convert template rooms to geometry format
-        geometry_data = []
+        # Template units are meters; the geometry service takes "pixels" and scales them by 0.02,
+        # so meters * 50 (the SVG scale) gives 1 template unit = 1 meter in 3D.
         scale = 50 # matches SVG scale
-        for room in template.rooms:
-            # Template x,y are in meters (or units), we need to scale if we want to match SVG coordinates
-            # But geometry service takes "pixels" and scales them down by 0.02 to get meters.
-            # So if we want 1 unit in template to be 1 meter in 3D:
-            # geometry service: w * 0.02 = meters. => w_pixels = meters / 0.02 = meters * 50.
-            # So passing (meters * 50) as pixels works perfectly with the current geometry service logic.
-            
-            w_px = room.width * scale
-            h_px = room.height * scale
-            x_px = room.x * scale
-            y_px = room.y * scale
-            
-            geometry_data.append({
-                "id": room.id,
-                "name": room.type.value.replace("_", " ").title(),
-                "type": room.type,
-                "x": x_px,
-                "y": y_px,
-                "width": w_px,
-                "height": h_px,
-                "center_x": x_px + w_px/2,
-                "center_y": y_px + h_px/2
-            })
+        rects = template.room_rects() * scale # x, y, width, height per room
+        
+        geometry = GeometryBatch(
+            ids=[room.id for room in template.rooms],
+            types=np.array([room.type for room in template.rooms], dtype=object),
+            xy=rects[:, :2],
+            wh=rects[:, 2:],
+            centers=rects[:, :2] + rects[:, 2:] / 2
+        )
             
-        glb_bytes = geometry_service.create_3d_model(geometry_data)
-        glb_b64 = None
-        if glb_bytes:
-            glb_b64 = base64.b64encode(glb_bytes).decode('utf-8')
+        glb_bytes = await run_in_threadpool(geometry_service.create_3d_model, geometry)
+        job_id = await _store_glb(glb_bytes)
         
         return GenerationResponse(
             template_id=template.id,
             template_name=template.name,
             svg_content=svg_output,
-            glb_content=glb_b64,
+            job_id=job_id,
             metadata={
                 "width": template.width,
                 "height": template.height,
@@ -90,6 +86,68 @@ async def generate_baseline_layout(
             raise e
         raise HTTPException(status_code=500, detail=f"Generation failed: {str(e)}")
 
+def _mock_layout_result(program: ArchitecturalProgram) -> Optional[Dict[str, Any]]:
+    """
+    Deterministic stand-in for the diffusion output when ML is unavailable.
+    Uses the best matching template's SVG and lays the program rooms out as dummy boxes.
+    """
+    template = template_service.find_best_match(program)
+    if not template:
+        return None
+    
+    # Quick mock geometry from rooms
+    mock_geometry = []
+    x_offset, y_offset = 0, 0
+    for room in program.rooms:
+        w, h = 150, 150 # Mock size
+        mock_geometry.append({
+            "id": room.id,
+            "name": room.name,
+            "type": room.type,
+            "x": x_offset,
+            "y": y_offset,
+            "width": w,
+            "height": h,
+            "center_x": x_offset + w/2,
+            "center_y": y_offset + h/2
+        })
+        x_offset += 160
+        if x_offset > 300:
+            x_offset = 0
+            y_offset += 160
+    
+    return {
+        "svg": template_service.render_svg(template),
+        "geometry": mock_geometry
+    }
+
+def _extrude(rooms_geometry: List[Dict[str, Any]]) -> bytes:
+    return geometry_service.create_3d_model(GeometryBatch.from_records(rooms_geometry))
+
+async def _store_glb(glb_bytes: Optional[bytes]) -> Optional[str]:
+    """
+    Store the GLB for a short time so the client can stream it separately from the JSON response.
+    """
+    if not glb_bytes:
+        return None
+    job_id = uuid.uuid4().hex
+    await cache.set(f"glb:{job_id}", glb_bytes, ex=settings.GLB_TTL_SECONDS)
+    return job_id
+
+async def _diffusion_response(layout_result: Dict[str, Any], glb_bytes: Optional[bytes], is_mock: bool) -> GenerationResponse:
+    job_id = await _store_glb(glb_bytes)
+    
+    return GenerationResponse(
+        template_id="ai_generated_mock" if is_mock else "ai_generated_v1",
+        template_name="AI Diffusion Generation (Mock)" if is_mock else "AI Diffusion Generation",
+        svg_content=layout_result["svg"],
+        job_id=job_id,
+        metadata={
+            "score": 0.0, 
+            "method": "diffusion_model_3d"
+        }
+    )
+
 @router.post("/diffusion", response_model=GenerationResponse)
 async def generate_diffusion_layout(
     program: ArchitecturalProgram,
@@ -103,70 +161,83 @@ async def generate_diffusion_layout(
         graph_data = graph_builder.build_constraint_graph(program)
         
         # 2. Run Inference (SVG + Geometry Data)
+        is_mock = False
         try:
-            # This will load models on first request if not loaded
-            layout_result = ml_service.generate_layout(graph_data)
+            # Loads models on first request if warmup hasn't finished; runs in the threadpool
+            # so waiting on the model load (or the diffusion pass) never blocks the event loop
+            layout_result = await run_in_threadpool(ml_service.generate_layout, graph_data)
         except RuntimeError as ml_err:
             print(f"ML Service unavailable: {ml_err}. Falling back to mock generation.")
             # Fallback to a deterministic mock result if ML is missing
-            from app.core.templates import template_service
-            # Use a template but pretend it's AI generated for the flow
-            template = template_service.find_best_match(program)
-            if not template: 
+            layout_result = _mock_layout_result(program)
+            if not layout_result: 
                  raise HTTPException(status_code=404, detail="Generation failed and no fallback template found.")
-            
-            # Convert template to geometry format expected by 3D service
-            # We need to parse the SVG or just mock the geometry data for the template
-            # For simplicity, let's just use the template's SVG and generate some dummy 3D boxes based on rooms
-            
-            # Quick mock geometry from rooms
-            mock_geometry = []
-            import random
-            x_offset, y_offset = 0, 0
-            for room in program.rooms:
-                w, h = 150, 150 # Mock size
-                mock_geometry.append({
-                    "id": room.id,
-                    "name": room.name,
-                    "type": room.type,
-                    "x": x_offset,
-                    "y": y_offset,
-                    "width": w,
-                    "height": h,
-                    "center_x": x_offset + w/2,
-                    "center_y": y_offset + h/2
-                })
-                x_offset += 160
-                if x_offset > 300:
-                    x_offset = 0
-                    y_offset += 160
-            
-            layout_result = {
-                "svg": template_service.render_svg(template),
-                "geometry": mock_geometry
-            }
+            is_mock = True
 
-        svg_content = layout_result["svg"]
-        geometry_data = layout_result["geometry"]
-        
         # 3. Generate 3D Model (GLB)
-        glb_bytes = geometry_service.create_3d_model(geometry_data)
-        glb_b64 = None
-        if glb_bytes:
-            glb_b64 = base64.b64encode(glb_bytes).decode('utf-8')
+        glb_bytes = await run_in_threadpool(_extrude, layout_result["geometry"])
         
-        return GenerationResponse(
-            template_id="ai_generated_mock" if "mock_geometry" in locals() else "ai_generated_v1",
-            template_name="AI Diffusion Generation (Mock)" if "mock_geometry" in locals() else "AI Diffusion Generation",
-            svg_content=svg_content,
-            glb_content=glb_b64,
-            metadata={
-                "score": 0.0, 
-                "method": "diffusion_model_3d"
-            }
-        )
+        return await _diffusion_response(layout_result, glb_bytes, is_mock)
     except Exception as e:
         print(f"Diffusion Generation error: {e}")
-        import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"AI Generation failed: {str(e)}")
+
+@router.post("/diffusion/batch", response_model=List[GenerationResponse])
+async def generate_diffusion_layout_batch(
+    request: BatchGenerationRequest,
+    current_user: User = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    Generate layouts for several programs with a single batched diffusion pass.
+    Results are returned in the same order as the submitted programs.
+    """
+    if not request.programs:
+        raise HTTPException(status_code=400, detail="At least one program is required")
+
+    try:
+        # 1. Build Graphs
+        graphs = [graph_builder.build_constraint_graph(program) for program in request.programs]
+        
+        # 2. Run batched Inference
+        is_mock = False
+        try:
+            # One GNN + diffusion pass over the whole batch, off the event loop
+            layout_results = await run_in_threadpool(ml_service.generate_layout_batch, graphs)
+        except RuntimeError as ml_err:
+            print(f"ML Service unavailable: {ml_err}. Falling back to mock generation.")
+            layout_results = [_mock_layout_result(program) for program in request.programs]
+            if any(result is None for result in layout_results):
+                raise HTTPException(status_code=404, detail="Generation failed and no fallback template found.")
+            is_mock = True
+
+        # 3. Generate 3D Models (GLB) in parallel worker threads
+        glbs = await asyncio.gather(*(
+            run_in_threadpool(_extrude, result["geometry"])
+            for result in layout_results
+        ))
+        
+        return await asyncio.gather(*(
+            _diffusion_response(result, glb_bytes, is_mock)
+            for result, glb_bytes in zip(layout_results, glbs)
+        ))
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Batch Diffusion Generation error: {e}")
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=f"AI Generation failed: {str(e)}")
+
+@router.get("/{job_id}/glb")
+async def get_generated_glb(
+    job_id: str,
+    current_user: User = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    Stream the binary GLB model produced by a generation request.
+    Models expire `GLB_TTL_SECONDS` after generation.
+    """
+    glb_bytes = await cache.get(f"glb:{job_id}")
+    if glb_bytes is None:
+        raise HTTPException(status_code=404, detail="Model not found or expired")
+    return StreamingResponse(io.BytesIO(glb_bytes), media_type="model/gltf-binary")
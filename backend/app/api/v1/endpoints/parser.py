@@ -1,14 +1,21 @@
 from fastapi import APIRouter, Depends, HTTPException
-from typing import Any
+from fastapi.responses import StreamingResponse
+from typing import Any, AsyncIterator, List
+import asyncio
+import json
 from pydantic import BaseModel
 
 from app.api import deps
 from app.models.user import User
-from app.schemas.architecture import ArchitecturalProgram
+from app.schemas.architecture import ArchitecturalProgram, Room, RoomType, Adjacency, AdjacencyType, GlobalConstraints, RoomConstraint
 from app.core.llm import llm_parser
+from app.config import settings
 
 router = APIRouter()
 
+# Caps in-flight OpenAI requests from parse_multi across all requests (rate limits)
+_llm_semaphore = asyncio.Semaphore(settings.OPENAI_CONCURRENCY)
+
 class PromptRequest(BaseModel):
     text: str
 
@@ -24,7 +31,6 @@ async def parse_architectural_prompt(
         raise HTTPException(status_code=400, detail="Prompt text cannot be empty")
         
     # Check if we have an API key configured
-    from app.config import settings
     if not settings.OPENAI_API_KEY:
         raise HTTPException(status_code=400, detail="OPENAI_API_KEY is not set")
 
@@ -35,21 +41,82 @@ async def parse_architectural_prompt(
         print(f"LLM processing failed: {str(e)}")
         raise HTTPException(status_code=502, detail=f"LLM parsing failed: {str(e)}")
 
+# Fixed part of the mock program; only raw_prompt varies per call
+_MOCK_BASE = {
+    "rooms": [
+        Room(id="living_1", name="Living Room", type=RoomType.LIVING_ROOM, constraints=RoomConstraint(room_id="living_1", min_area=20, natural_light=True)),
+        Room(id="kitchen_1", name="Kitchen", type=RoomType.KITCHEN, constraints=RoomConstraint(room_id="kitchen_1", min_area=12, natural_light=True)),
+        Room(id="bed_1", name="Master Bedroom", type=RoomType.BEDROOM, constraints=RoomConstraint(room_id="bed_1", min_area=15, natural_light=True)),
+        Room(id="bath_1", name="Master Bath", type=RoomType.BATHROOM, constraints=RoomConstraint(room_id="bath_1", min_area=6, natural_light=False)),
+    ],
+    "adjacencies": [
+        Adjacency(room_id_a="living_1", room_id_b="kitchen_1", type=AdjacencyType.DIRECT),
+        Adjacency(room_id_a="bed_1", room_id_b="bath_1", type=AdjacencyType.DIRECT),
+        Adjacency(room_id_a="living_1", room_id_b="bed_1", type=AdjacencyType.FAR),
+    ],
+    "global_constraints": GlobalConstraints(total_area_min=80, total_area_max=120, floors=1)
+}
+
+@router.post("/parse/stream")
+async def parse_architectural_prompt_stream(
+    prompt_request: PromptRequest,
+    current_user: User = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    Streaming variant of /parse for clients that render progressively.
+    Responds with NDJSON lines: {"delta": "..."} chunks of the raw program JSON as the LLM produces them,
+    then a final {"program": {...}} (or {"error": "..."} if parsing fails mid-stream).
+    """
+    if not prompt_request.text:
+        raise HTTPException(status_code=400, detail="Prompt text cannot be empty")
+        
+    if not settings.OPENAI_API_KEY:
+        raise HTTPException(status_code=400, detail="OPENAI_API_KEY is not set")
+
+    async def events() -> AsyncIterator[str]:
+        try:
+            async for item in llm_parser.parse_prompt_stream(prompt_request.text):
+                if isinstance(item, ArchitecturalProgram):
+                    yield '{"program":' + item.model_dump_json() + '}\n'
+                else:
+                    yield json.dumps({"delta": item}) + "\n"
+        except Exception as e:
+            print(f"LLM processing failed: {str(e)}")
+            yield json.dumps({"error": f"LLM parsing failed: {str(e)}"}) + "\n"
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+@router.post("/parse_multi", response_model=List[ArchitecturalProgram])
+async def parse_architectural_prompts(
+    prompt_requests: List[PromptRequest],
+    current_user: User = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    Parse several prompts concurrently. Results are returned in the same order as the prompts.
+    """
+    if not prompt_requests:
+        raise HTTPException(status_code=400, detail="At least one prompt is required")
+    if any(not prompt_request.text for prompt_request in prompt_requests):
+        raise HTTPException(status_code=400, detail="Prompt text cannot be empty")
+
+    if not settings.OPENAI_API_KEY:
+        raise HTTPException(status_code=400, detail="OPENAI_API_KEY is not set")
+
+    async def parse(text: str) -> ArchitecturalProgram:
+        async with _llm_semaphore:
+            return await llm_parser.parse_prompt(text)
+
+    try:
+        return await asyncio.gather(*(parse(prompt_request.text) for prompt_request in prompt_requests))
+    except Exception as e:
+        print(f"LLM processing failed: {str(e)}")
+        raise HTTPException(status_code=502, detail=f"LLM parsing failed: {str(e)}")
+
 def _get_mock_program(text: str) -> ArchitecturalProgram:
-    from app.schemas.architecture import Room, RoomType, Adjacency, AdjacencyType, GlobalConstraints, RoomConstraint
-    
-    return ArchitecturalProgram(
+    # Parts were validated once at import, so skip validation here
+    return ArchitecturalProgram.model_construct(
         raw_prompt=text,
-        rooms=[
-            Room(id="living_1", name="Living Room", type=RoomType.LIVING_ROOM, constraints=RoomConstraint(room_id="living_1", min_area=20, natural_light=True)),
-            Room(id="kitchen_1", name="Kitchen", type=RoomType.KITCHEN, constraints=RoomConstraint(room_id="kitchen_1", min_area=12, natural_light=True)),
-            Room(id="bed_1", name="Master Bedroom", type=RoomType.BEDROOM, constraints=RoomConstraint(room_id="bed_1", min_area=15, natural_light=True)),
-            Room(id="bath_1", name="Master Bath", type=RoomType.BATHROOM, constraints=RoomConstraint(room_id="bath_1", min_area=6, natural_light=False)),
-        ],
-        adjacencies=[
-            Adjacency(room_id_a="living_1", room_id_b="kitchen_1", type=AdjacencyType.DIRECT),
-            Adjacency(room_id_a="bed_1", room_id_b="bath_1", type=AdjacencyType.DIRECT),
-            Adjacency(room_id_a="living_1", room_id_b="bed_1", type=AdjacencyType.FAR),
-        ],
-        global_constraints=GlobalConstraints(total_area_min=80, total_area_max=120, floors=1)
+        rooms=list(_MOCK_BASE["rooms"]),
+        adjacencies=list(_MOCK_BASE["adjacencies"]),
+        global_constraints=_MOCK_BASE["global_constraints"]
     )
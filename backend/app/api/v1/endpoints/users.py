@@ -4,7 +4,7 @@ from fastapi.encoders import jsonable_encoder
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
-from app.database import get_db
+from app.database import get_db_tx
 from app.models.user import User
 from app.schemas.user import User as UserSchema, UserCreate, UserUpdate
 from app.core import security
@@ -15,7 +15,7 @@ router = APIRouter()
 @router.post("/", response_model=UserSchema)
 async def create_user(
     *,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_db_tx, scope="function"),
     user_in: UserCreate,
 ) -> Any:
     """
@@ -36,7 +36,7 @@ async def create_user(
         is_superuser=user_in.is_superuser,
     )
     db.add(user)
-    await db.commit()
+    await db.flush() # get_db_tx commits when the endpoint returns
     await db.refresh(user)
     return user
 
@@ -7,9 +7,13 @@ class Settings(BaseSettings):
     
     # Database
     DATABASE_URL: str
+    DB_POOL_SIZE: int = 20
+    DB_MAX_OVERFLOW: int = 10
     
     # Redis
     REDIS_URL: str
+    GLB_TTL_SECONDS: int = 300 # Generated GLB models are kept this long for download
+    REDIS_RETRY_SECONDS: int = 30 # After a Redis error, use the in-process cache this long before retrying Redis
     
     # MinIO
     MINIO_ENDPOINT: str
@@ -24,11 +28,29 @@ class Settings(BaseSettings):
     
     # Dev/Test
     MOCK_AUTH: bool = False
+    SQL_ECHO: bool = False # Log every SQL statement (slow, debugging only)
     
     # AI Providers
     OPENAI_API_KEY: str = ""
     ANTHROPIC_API_KEY: str = ""
-    
+    LLM_CACHE_TTL_SECONDS: int = 86400 # Parsed programs are cached per normalized prompt this long
+    OPENAI_CONCURRENCY: int = 8 # Max concurrent OpenAI requests for batched parsing
+
+    # ML Inference
+    DIFFUSION_STEPS: int = 50 # Reverse diffusion steps per sample (fewer = faster, coarser)
+    ML_COMPILE: bool = False # torch.compile the GNN and denoiser at startup (slow warmup, faster steps)
+    DIFFUSION_CACHE_SIZE: int = 256 # Cached layouts/latents keyed by constraint graph hash
+    DIFFUSION_REUSE_DEPTH: int = 10 # Denoising steps skipped when resuming from a cached latent
+    DIFFUSION_REUSE_MAX_GED: float = 0.0 # Max graph edit distance for reusing a cached latent (0 = exact hits only)
+    DIFFUSION_CACHE_INTERVAL: int = 1 # Run the denoising network every Nth step, extrapolate in between (1 = off)
+    ML_DTYPE: str = "fp32" # Diffusion precision: fp32, int8 (dynamic quantization) or bf16 (autocast)
+
+    # Templates
+    TEMPLATE_CACHE_SIZE: int = 512 # Memoized template matches / rendered SVGs
+
+    # Concurrency
+    THREADPOOL_SIZE: int = 64 # Max worker threads for blocking work offloaded from the event loop
+
     # CORS
     BACKEND_CORS_ORIGINS: List[str] = ["http://localhost:3000", "http://localhost:8000"]
 
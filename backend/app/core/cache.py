@@ -0,0 +1,64 @@
+import time
+from typing import Dict, Optional, Tuple
+import redis.asyncio as redis
+from redis.exceptions import RedisError
+from app.config import settings
+
+class CacheService:
+    """
+    Thin async wrapper around Redis for short-lived blobs.
+    Falls back to an in-process store with expiry when Redis is unreachable
+    (e.g. local development without docker-compose), so callers never see connection errors.
+    After a Redis error the local store is used exclusively for `REDIS_RETRY_SECONDS`, so requests
+    don't each wait on a connect timeout and a set/get pair lands on the same backend.
+    """
+    def __init__(self):
+        self.client = redis.from_url(settings.REDIS_URL, socket_connect_timeout=1)
+        self._local: Dict[str, Tuple[float, bytes]] = {}
+        self._retry_after = 0.0 # Monotonic time before which Redis is skipped
+
+    async def get(self, key: str) -> Optional[bytes]:
+        if self._redis_available():
+            try:
+                value = await self.client.get(key)
+                if value is not None:
+                    return value
+                # Not in Redis: it may have been stored locally while Redis was down
+            except RedisError as e:
+                self._mark_unavailable(e)
+
+        item = self._local.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            del self._local[key]
+            return None
+        return value
+
+    async def set(self, key: str, value: bytes, ex: int):
+        if self._redis_available():
+            try:
+                await self.client.set(key, value, ex=ex)
+                self._local.pop(key, None) # Never shadowed by an older local copy
+                return
+            except RedisError as e:
+                self._mark_unavailable(e)
+
+        now = time.monotonic()
+        # Drop expired entries so the fallback store doesn't grow unbounded
+        for stale in [k for k, (expires_at, _) in self._local.items() if expires_at < now]:
+            del self._local[stale]
+        self._local[key] = (now + ex, value)
+
+    async def close(self):
+        await self.client.aclose()
+
+    def _redis_available(self) -> bool:
+        return time.monotonic() >= self._retry_after
+
+    def _mark_unavailable(self, error: Exception):
+        print(f"WARNING: Redis unavailable ({error}). Using in-process cache for {settings.REDIS_RETRY_SECONDS}s.")
+        self._retry_after = time.monotonic() + settings.REDIS_RETRY_SECONDS
+
+cache = CacheService()
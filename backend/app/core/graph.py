@@ -1,68 +1,148 @@
-import networkx as nx
-from typing import Dict, Any
+import hashlib
+import json
+from functools import lru_cache
+from typing import Dict, Any, List, Tuple
 from app.schemas.architecture import ArchitecturalProgram, Room, Adjacency, AdjacencyType
 
+# Numerical weight per adjacency type. Higher weight = stronger attraction.
+# Unknown types fall back to 0.1.
+_ADJ_WEIGHTS: Dict[AdjacencyType, float] = {
+    AdjacencyType.DIRECT: 1.0,
+    AdjacencyType.ADJACENT: 0.8,
+    AdjacencyType.NEAR: 0.5,
+    AdjacencyType.FAR: -0.5 # Repulsion in force-directed layouts
+}
+
 class GraphBuilderService:
+    def __init__(self, cache_size: int = 1024):
+        # /graph/build and /generation/diffusion are typically called back-to-back with the same program
+        self._build_cached = lru_cache(maxsize=cache_size)(self._build_from_json)
+
     def build_constraint_graph(self, program: ArchitecturalProgram) -> Dict[str, Any]:
         """
-        Converts an ArchitecturalProgram into a NetworkX graph JSON representation.
+        Converts an ArchitecturalProgram into a NetworkX node-link JSON representation.
         Nodes = Rooms
         Edges = Adjacencies
         Global Attributes = Global Constraints
+        Results are memoized per program, so callers must treat the returned dict as read-only.
         """
-        G = nx.Graph()
-        
-        # Add Global Constraints as graph attributes
-        G.graph["global_constraints"] = program.global_constraints.model_dump()
-        G.graph["raw_prompt"] = program.raw_prompt
+        return self._build_cached(program.model_dump_json())
+
+    def _build_from_json(self, program_json: str) -> Dict[str, Any]:
+        return self._build(ArchitecturalProgram.model_validate_json(program_json))
 
-        # Add Nodes (Rooms)
+    def _build(self, program: ArchitecturalProgram) -> Dict[str, Any]:
+        """
+        The node-link dict is built directly (graphs here are tiny, so NetworkX overhead dominates);
+        nx.node_link_graph() still reads it back.
+        """
+        # Add Nodes (Rooms). Keyed by id so a repeated id updates the node, like G.add_node
+        nodes: Dict[str, Dict[str, Any]] = {}
         for room in program.rooms:
-            G.add_node(
-                room.id,
-                label=room.name,
-                type=room.type.value,
-                min_area=room.constraints.min_area,
-                max_area=room.constraints.max_area,
-                aspect_ratio=room.constraints.aspect_ratio,
-                natural_light=room.constraints.natural_light,
-                description=room.description
-            )
+            nodes[room.id] = {
+                "label": room.name,
+                "type": room.type.value,
+                "min_area": room.constraints.min_area,
+                "max_area": room.constraints.max_area,
+                "aspect_ratio": room.constraints.aspect_ratio,
+                "natural_light": room.constraints.natural_light,
+                "description": room.description,
+                "id": room.id
+            }
 
-        # Add Edges (Adjacencies)
+        # Add Edges (Adjacencies). Undirected, so (a, b) and (b, a) are the same edge; a repeat updates it
+        edges: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        neighbors: Dict[str, Dict[str, None]] = {node_id: {} for node_id in nodes} # Insertion-ordered, like nx adjacency
         for adj in program.adjacencies:
             # Verify nodes exist to avoid errors
-            if adj.room_id_a in G.nodes and adj.room_id_b in G.nodes:
-                weight = self._get_adjacency_weight(adj.type)
-                G.add_edge(
-                    adj.room_id_a,
-                    adj.room_id_b,
-                    type=adj.type.value,
-                    weight=weight,
-                    description=adj.description
-                )
-        
+            if adj.room_id_a in nodes and adj.room_id_b in nodes:
+                key = tuple(sorted((adj.room_id_a, adj.room_id_b)))
+                edges[key] = {
+                    "type": adj.type.value,
+                    "weight": _ADJ_WEIGHTS.get(adj.type, 0.1),
+                    "description": adj.description
+                }
+                neighbors[adj.room_id_a][adj.room_id_b] = None
+                neighbors[adj.room_id_b][adj.room_id_a] = None
+
         # Validate graph (basic connectivity check)
         # Note: Disconnected components are allowed in some cases (e.g. detached garage), 
         # but we might want to flag them.
-        is_connected = nx.is_connected(G) if len(G.nodes) > 0 else True
-        G.graph["is_connected"] = is_connected
+        graph_attrs = {
+            "global_constraints": program.global_constraints.model_dump(),
+            "raw_prompt": program.raw_prompt,
+            "is_connected": self._is_connected(nodes, edges)
+        }
+        graph_attrs["cache_key"] = self._get_cache_key(nodes, edges, graph_attrs["global_constraints"])
+
+        # Same layout as nx.node_link_data
+        return {
+            "directed": False,
+            "multigraph": False,
+            "graph": graph_attrs,
+            "nodes": list(nodes.values()),
+            "edges": self._ordered_edges(nodes, neighbors, edges)
+        }
+
+    def _ordered_edges(self, nodes: Dict[str, Any], neighbors: Dict[str, Dict[str, None]], edges: Dict[Tuple[str, str], Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Edge list in nx.Graph.edges order (grouped by node order, each edge oriented from the
+        node reached first), so the output and PyG edge_index order match nx.node_link_data.
+        """
+        ordered = []
+        seen = set()
+        for u in nodes:
+            for v in neighbors[u]:
+                if v not in seen:
+                    ordered.append({**edges[tuple(sorted((u, v)))], "source": u, "target": v})
+            seen.add(u)
+        return ordered
+
+    def _is_connected(self, nodes: Dict[str, Any], edges: Dict[Tuple[str, str], Any]) -> bool:
+        """
+        Union-find connectivity check. An empty graph counts as connected.
+        """
+        parent = {node_id: node_id for node_id in nodes}
 
-        # Convert to node-link data for JSON serialization
-        graph_data = nx.node_link_data(G)
-        return graph_data
+        def find(x: str) -> str:
+            while parent[x] != x:
+                parent[x] = parent[parent[x]] # Path halving
+                x = parent[x]
+            return x
+
+        components = len(parent)
+        for a, b in edges:
+            root_a, root_b = find(a), find(b)
+            if root_a != root_b:
+                parent[root_a] = root_b
+                components -= 1
+        return components <= 1
+
+    def _get_cache_key(self, nodes: Dict[str, Dict[str, Any]], edges: Dict[Tuple[str, str], Dict[str, Any]], global_constraints: Dict[str, Any]) -> str:
+        """
+        Canonical hash of the constraint graph (nodes, edges, global constraints).
+        Semantically identical programs map to the same key regardless of room/adjacency order.
+        The raw prompt is excluded since it does not affect generation.
+        """
+        node_items = sorted(
+            (node_id, sorted((k, v) for k, v in data.items() if k != "id"))
+            for node_id, data in nodes.items()
+        )
+        edge_items = sorted(
+            (a, b, sorted((k, v) for k, v in data.items() if k not in ("source", "target")))
+            for (a, b), data in edges.items()
+        )
+        canonical = json.dumps(
+            [node_items, edge_items, global_constraints],
+            sort_keys=True, separators=(",", ":"), default=str
+        )
+        return hashlib.blake2b(canonical.encode("utf-8"), digest_size=16).hexdigest()
 
     def _get_adjacency_weight(self, adj_type: AdjacencyType) -> float:
         """
         Returns a numerical weight for the adjacency type.
         Higher weight = stronger attraction.
         """
-        weights = {
-            AdjacencyType.DIRECT: 1.0,
-            AdjacencyType.ADJACENT: 0.8,
-            AdjacencyType.NEAR: 0.5,
-            AdjacencyType.FAR: -0.5 # Repulsion in force-directed layouts
-        }
-        return weights.get(adj_type, 0.1)
+        return _ADJ_WEIGHTS.get(adj_type, 0.1)
 
 graph_builder = GraphBuilderService()
@@ -1,126 +1,169 @@
+import hashlib
 import json
-from typing import Any, Dict
+from typing import Any, AsyncIterator, Dict, Optional, Type, Union
+import httpx
 import openai
+from pydantic import BaseModel
 from app.config import settings
+from app.core.cache import cache
 from app.schemas.architecture import ArchitecturalProgram
 
+# The output structure is enforced by the JSON schema below, so the prompt only carries the rules
+SYSTEM_PROMPT = """
+You are a senior architectural program analyst. Convert the user's request for a real building into an architectural program.
+
+RULES
+1) Extract EVERY room mentioned; counts become distinct rooms ("2-bedroom" => bedroom_1, bedroom_2).
+2) Do NOT invent rooms that are not implied by the prompt.
+3) Every room has a unique id, and constraints.room_id equals that id.
+4) Synonyms: master bedroom -> bedroom; ensuite, wc, toilet, powder room -> bathroom; open kitchen -> kitchen;
+   living area, lounge -> living_room; study -> office.
+5) Adjacencies: open kitchen/open plan => kitchen-living_room direct; dining_room => near kitchen;
+   balcony => adjacent to living_room; ensuite => direct to its bedroom; "next to"/"connected" => direct or adjacent.
+6) Infer reasonable residential min/max areas when unspecified. Floors default to 1; style is null unless stated.
+"""
+
+def _strict_json_schema(model: Type[BaseModel]) -> Dict[str, Any]:
+    """
+    Pydantic JSON schema adjusted for OpenAI strict structured outputs:
+    every property required (optional fields are already nullable), no extra properties, no defaults.
+    """
+    schema = model.model_json_schema()
+    schema["properties"].pop("raw_prompt", None) # Set from the request, not by the model
+
+    def visit(node: Any):
+        if isinstance(node, dict):
+            node.pop("default", None)
+            if node.get("type") == "object" and "properties" in node:
+                node["required"] = list(node["properties"])
+                node["additionalProperties"] = False
+            for value in node.values():
+                visit(value)
+        elif isinstance(node, list):
+            for value in node:
+                visit(value)
+
+    visit(schema)
+    return schema
+
+_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "ArchitecturalProgram",
+        "schema": _strict_json_schema(ArchitecturalProgram),
+        "strict": True
+    }
+}
+
 class LLMParserService:
     def __init__(self):
-        self.client = openai.AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+        # One pooled HTTP/2 connection set for the app's lifetime so warm requests skip the TLS handshake
+        self.client = openai.AsyncOpenAI(
+            api_key=settings.OPENAI_API_KEY,
+            http_client=openai.DefaultAsyncHttpxClient(
+                http2=True,
+                timeout=30,
+                limits=httpx.Limits(max_keepalive_connections=100, max_connections=200)
+            )
+        )
+
+    async def close(self):
+        await self.client.close()
 
     async def parse_prompt(self, user_prompt: str) -> ArchitecturalProgram:
         """
         Parses a natural language architectural prompt into a structured program using OpenAI API directly.
+        Results are cached per normalized prompt so repeated prompts skip the LLM call.
         """
-        system_prompt = """
-        You are a senior architectural program analyst. Convert user requests into a strict architectural program JSON.
-        Treat the user's text as requirements for real buildings. Be precise, deterministic, and complete.
-
-        HARD RULES
-        1) Extract EVERY room explicitly mentioned (bedrooms, bathrooms, dining room, balcony, office, etc.).
-        2) Convert counts into distinct rooms ("2-bedroom" => bedroom_1 + bedroom_2).
-        3) Do NOT invent rooms that are not implied by the prompt.
-        4) Ensure every room has a unique id and constraints.room_id set to that id.
-        5) Output JSON only (no commentary, no markdown), matching the schema below.
-
-        NORMALIZATION RULES
-        - Use only these types:
-          living_room, kitchen, bedroom, bathroom, dining_room, office, garage,
-          balcony, corridor, storage, utility, entrance, other
-        - Map synonyms:
-          master bedroom -> bedroom
-          ensuite -> bathroom
-          wc / toilet / powder room -> bathroom
-          open kitchen -> kitchen
-          living area / lounge -> living_room
-          study -> office
-        - If a room name implies a count (e.g., "two bathrooms"), create separate rooms with distinct ids.
-
-        ADJACENCY RULES
-        - "open kitchen" or "open plan" => kitchen adjacent to living_room (type: direct)
-        - dining_room mentioned => dining_room adjacent to kitchen (type: near unless explicit)
-        - balcony mentioned => balcony adjacent to living_room (type: adjacent unless explicit)
-        - ensuite mentioned => that bathroom adjacent to the associated bedroom (type: direct)
-        - If explicit adjacency terms appear ("next to", "adjacent", "connected"), use type direct/adjacent as appropriate.
-
-        DEFAULTS
-        - If area is unspecified, infer reasonable min/max areas for residential rooms.
-        - If floors not specified, set floors = 1.
-        - If style not specified, leave style as "".
-
-        EXAMPLE BEHAVIOR (informative only):
-        "Design a 3-bedroom family apartment with two bathrooms and a dining room"
-        => bedrooms: 3 rooms, bathrooms: 2 rooms, dining_room: 1 room
-
-        Output must be a valid JSON object matching the following structure:
-        {
-            "rooms": [
-                {
-                    "id": "string",
-                    "name": "string",
-                    "type": "living_room|kitchen|bedroom|bathroom|dining_room|office|garage|balcony|corridor|storage|utility|entrance|other",
-                    "description": "string",
-                    "constraints": {
-                        "room_id": "string",
-                        "min_area": float,
-                        "max_area": float,
-                        "aspect_ratio": float,
-                        "natural_light": boolean
-                    }
-                }
-            ],
-            "adjacencies": [
-                {
-                    "room_id_a": "string",
-                    "room_id_b": "string",
-                    "type": "direct|adjacent|near|far",
-                    "description": "string"
-                }
-            ],
-            "global_constraints": {
-                "total_area_min": float,
-                "total_area_max": float,
-                "floors": int,
-                "style": "string",
-                "site_width": float,
-                "site_depth": float
-            }
-        }
-        """
+        cache_key = self._get_cache_key(user_prompt)
+        cached = await self._get_cached(cache_key, user_prompt)
+        if cached is not None:
+            return cached
 
         try:
-            response = await self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                response_format={"type": "json_object"},
-                temperature=0
-            )
+            response = await self.client.chat.completions.create(**self._completion_args(user_prompt))
             
             content = response.choices[0].message.content
             if not content:
                 raise ValueError("Empty response from LLM")
                 
-            data = json.loads(content)
+            program = self._to_program(content, user_prompt)
+            await cache.set(cache_key, program.model_dump_json().encode("utf-8"), ex=settings.LLM_CACHE_TTL_SECONDS)
+            return program
+
+        except Exception as e:
+            print(f"Error parsing LLM response: {e}")
+            raise e
+
+    async def parse_prompt_stream(self, user_prompt: str) -> AsyncIterator[Union[str, ArchitecturalProgram]]:
+        """
+        Streaming variant of parse_prompt.
+        Yields the raw JSON text as it arrives from the LLM, then the validated program.
+        """
+        cache_key = self._get_cache_key(user_prompt)
+        cached = await self._get_cached(cache_key, user_prompt)
+        if cached is not None:
+            yield cached
+            return
+
+        try:
+            stream = await self.client.chat.completions.create(**self._completion_args(user_prompt), stream=True)
             
-            # Post-process to ensure data consistency
-            if "rooms" in data:
-                for room in data["rooms"]:
-                    # Ensure constraints have room_id matching the room
-                    if "constraints" in room:
-                        if "room_id" not in room["constraints"]:
-                            room["constraints"]["room_id"] = room.get("id")
+            parts = []
+            async for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    parts.append(delta)
+                    yield delta
             
-            program = ArchitecturalProgram(
-                raw_prompt=user_prompt,
-                **data
-            )
-            return program
+            content = "".join(parts)
+            if not content:
+                raise ValueError("Empty response from LLM")
+                
+            program = self._to_program(content, user_prompt)
+            await cache.set(cache_key, program.model_dump_json().encode("utf-8"), ex=settings.LLM_CACHE_TTL_SECONDS)
+            yield program
 
         except Exception as e:
             print(f"Error parsing LLM response: {e}")
             raise e
 
+    def _completion_args(self, user_prompt: str) -> Dict[str, Any]:
+        return {
+            "model": "gpt-4o-mini",
+            "messages": [
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": user_prompt}
+            ],
+            "response_format": _RESPONSE_FORMAT,
+            "temperature": 0
+        }
+
+    def _get_cache_key(self, user_prompt: str) -> str:
+        return "llm:" + hashlib.sha256(user_prompt.strip().lower().encode("utf-8")).hexdigest()
+
+    async def _get_cached(self, cache_key: str, user_prompt: str) -> Optional[ArchitecturalProgram]:
+        cached = await cache.get(cache_key)
+        if cached is None:
+            return None
+        program = ArchitecturalProgram.model_validate_json(cached)
+        program.raw_prompt = user_prompt
+        return program
+
+    def _to_program(self, content: str, user_prompt: str) -> ArchitecturalProgram:
+        data = json.loads(content)
+        
+        # Post-process to ensure data consistency
+        if "rooms" in data:
+            for room in data["rooms"]:
+                # Ensure constraints have room_id matching the room
+                if "constraints" in room:
+                    if "room_id" not in room["constraints"]:
+                        room["constraints"]["room_id"] = room.get("id")
+        
+        return ArchitecturalProgram(
+            raw_prompt=user_prompt,
+            **data
+        )
+
 llm_parser = LLMParserService()
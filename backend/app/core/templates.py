@@ -1,8 +1,23 @@
-from typing import List, Dict, Optional
-from pydantic import BaseModel
-from app.schemas.architecture import RoomType, ArchitecturalProgram
+import io
+from functools import lru_cache
+from typing import Callable, List, Dict, Optional, Tuple
+import numpy as np
+from pydantic import BaseModel, ConfigDict, PrivateAttr
+from app.config import settings
+from app.schemas.architecture import RoomType, ROOM_TYPE_IDX, ArchitecturalProgram
+
+def _count_room_types(rooms) -> List[int]:
+    counts = [0] * len(ROOM_TYPE_IDX)
+    for room in rooms:
+        counts[ROOM_TYPE_IDX[room.type]] += 1
+    return counts
+
+# Display label per room type, e.g. living_room -> "Living Room"
+_ROOM_TYPE_LABEL: Dict[RoomType, str] = {t: t.value.replace("_", " ").title() for t in RoomType}
 
 class TemplateRoom(BaseModel):
+    model_config = ConfigDict(frozen=True)
+    
     id: str
     type: RoomType
     x: float
@@ -12,121 +27,160 @@ class TemplateRoom(BaseModel):
     color: str = "#ffffff"
 
 class LayoutTemplate(BaseModel):
+    model_config = ConfigDict(frozen=True)
+    
     id: str
     name: str
     description: str
-    rooms: List[TemplateRoom]
+    rooms: Tuple[TemplateRoom, ...] # Immutable, so the cached room_rects() can't go stale
     width: float
     height: float
+    _room_rects: Optional[np.ndarray] = PrivateAttr(default=None)
+    
+    def room_rects(self) -> np.ndarray:
+        """
+        (N, 4) float64 array of room x, y, width, height. Built once and cached on the template.
+        float64 keeps the values (and the SVG numbers formatted from them) exact.
+        """
+        if self._room_rects is None:
+            rects = np.array([(r.x, r.y, r.width, r.height) for r in self.rooms], dtype=np.float64).reshape(-1, 4)
+            rects.flags.writeable = False
+            self._room_rects = rects
+        return self._room_rects
     
-    def get_room_counts(self) -> Dict[RoomType, int]:
-        counts = {}
-        for room in self.rooms:
-            counts[room.type] = counts.get(room.type, 0) + 1
-        return counts
+    def get_room_counts(self) -> List[int]:
+        """
+        Room count per type, indexed by ROOM_TYPE_IDX.
+        """
+        return _count_room_types(self.rooms)
 
 # Hardcoded MVP Templates
 # In a real system, these would load from DB or JSON files
+# Built with model_construct: the literals below are trusted, so import skips validation
 TEMPLATES = [
-    LayoutTemplate(
+    LayoutTemplate.model_construct(
         id="tpl_1bed_standard",
         name="Standard 1-Bedroom Apartment",
         description="A compact 1-bedroom unit with open living/kitchen area.",
         width=10.0,
         height=8.0,
-        rooms=[
-            TemplateRoom(id="living", type=RoomType.LIVING_ROOM, x=0, y=0, width=6, height=5, color="#FFE0B2"),
-            TemplateRoom(id="kitchen", type=RoomType.KITCHEN, x=0, y=5, width=6, height=3, color="#FFCCBC"),
-            TemplateRoom(id="bed", type=RoomType.BEDROOM, x=6, y=0, width=4, height=5, color="#BBDEFB"),
-            TemplateRoom(id="bath", type=RoomType.BATHROOM, x=6, y=5, width=4, height=3, color="#CFD8DC"),
-        ]
+        rooms=(
+            TemplateRoom.model_construct(id="living", type=RoomType.LIVING_ROOM, x=0, y=0, width=6, height=5, color="#FFE0B2"),
+            TemplateRoom.model_construct(id="kitchen", type=RoomType.KITCHEN, x=0, y=5, width=6, height=3, color="#FFCCBC"),
+            TemplateRoom.model_construct(id="bed", type=RoomType.BEDROOM, x=6, y=0, width=4, height=5, color="#BBDEFB"),
+            TemplateRoom.model_construct(id="bath", type=RoomType.BATHROOM, x=6, y=5, width=4, height=3, color="#CFD8DC"),
+        )
     ),
-    LayoutTemplate(
+    LayoutTemplate.model_construct(
         id="tpl_2bed_linear",
         name="Linear 2-Bedroom Layout",
         description="Efficient 2-bedroom layout arranged linearly.",
         width=14.0,
         height=7.0,
-        rooms=[
-            TemplateRoom(id="living", type=RoomType.LIVING_ROOM, x=4, y=0, width=5, height=7, color="#FFE0B2"),
-            TemplateRoom(id="kitchen", type=RoomType.KITCHEN, x=0, y=0, width=4, height=4, color="#FFCCBC"),
-            TemplateRoom(id="dining", type=RoomType.DINING_ROOM, x=0, y=4, width=4, height=3, color="#F0F4C3"),
-            TemplateRoom(id="bed_master", type=RoomType.BEDROOM, x=9, y=0, width=5, height=4, color="#BBDEFB"),
-            TemplateRoom(id="bed_guest", type=RoomType.BEDROOM, x=9, y=4, width=5, height=3, color="#E1BEE7"),
-            TemplateRoom(id="bath", type=RoomType.BATHROOM, x=4, y=5, width=2, height=2, color="#CFD8DC"), # Small internal bath
-        ]
+        rooms=(
+            TemplateRoom.model_construct(id="living", type=RoomType.LIVING_ROOM, x=4, y=0, width=5, height=7, color="#FFE0B2"),
+            TemplateRoom.model_construct(id="kitchen", type=RoomType.KITCHEN, x=0, y=0, width=4, height=4, color="#FFCCBC"),
+            TemplateRoom.model_construct(id="dining", type=RoomType.DINING_ROOM, x=0, y=4, width=4, height=3, color="#F0F4C3"),
+            TemplateRoom.model_construct(id="bed_master", type=RoomType.BEDROOM, x=9, y=0, width=5, height=4, color="#BBDEFB"),
+            TemplateRoom.model_construct(id="bed_guest", type=RoomType.BEDROOM, x=9, y=4, width=5, height=3, color="#E1BEE7"),
+            TemplateRoom.model_construct(id="bath", type=RoomType.BATHROOM, x=4, y=5, width=2, height=2, color="#CFD8DC"), # Small internal bath
+        )
     ),
-    LayoutTemplate(
+    LayoutTemplate.model_construct(
         id="tpl_3bed_family",
         name="Family 3-Bedroom Apartment",
         description="Spacious 3-bedroom unit suitable for families.",
         width=16.0,
         height=10.0,
-        rooms=[
-            TemplateRoom(id="living", type=RoomType.LIVING_ROOM, x=0, y=0, width=8, height=6, color="#FFE0B2"),
-            TemplateRoom(id="dining", type=RoomType.DINING_ROOM, x=8, y=0, width=5, height=4, color="#F0F4C3"),
-            TemplateRoom(id="kitchen", type=RoomType.KITCHEN, x=13, y=0, width=3, height=4, color="#FFCCBC"),
-            TemplateRoom(id="corridor", type=RoomType.CORRIDOR, x=0, y=6, width=16, height=1, color="#E0E0E0"),
-            TemplateRoom(id="bed_master", type=RoomType.BEDROOM, x=0, y=7, width=5, height=3, color="#BBDEFB"),
-            TemplateRoom(id="bed_2", type=RoomType.BEDROOM, x=5, y=7, width=4, height=3, color="#E1BEE7"),
-            TemplateRoom(id="bed_3", type=RoomType.BEDROOM, x=9, y=7, width=4, height=3, color="#E1BEE7"),
-            TemplateRoom(id="bath_1", type=RoomType.BATHROOM, x=13, y=7, width=3, height=3, color="#CFD8DC"),
-            TemplateRoom(id="bath_master", type=RoomType.BATHROOM, x=13, y=4, width=3, height=2, color="#CFD8DC"),
-        ]
+        rooms=(
+            TemplateRoom.model_construct(id="living", type=RoomType.LIVING_ROOM, x=0, y=0, width=8, height=6, color="#FFE0B2"),
+            TemplateRoom.model_construct(id="dining", type=RoomType.DINING_ROOM, x=8, y=0, width=5, height=4, color="#F0F4C3"),
+            TemplateRoom.model_construct(id="kitchen", type=RoomType.KITCHEN, x=13, y=0, width=3, height=4, color="#FFCCBC"),
+            TemplateRoom.model_construct(id="corridor", type=RoomType.CORRIDOR, x=0, y=6, width=16, height=1, color="#E0E0E0"),
+            TemplateRoom.model_construct(id="bed_master", type=RoomType.BEDROOM, x=0, y=7, width=5, height=3, color="#BBDEFB"),
+            TemplateRoom.model_construct(id="bed_2", type=RoomType.BEDROOM, x=5, y=7, width=4, height=3, color="#E1BEE7"),
+            TemplateRoom.model_construct(id="bed_3", type=RoomType.BEDROOM, x=9, y=7, width=4, height=3, color="#E1BEE7"),
+            TemplateRoom.model_construct(id="bath_1", type=RoomType.BATHROOM, x=13, y=7, width=3, height=3, color="#CFD8DC"),
+            TemplateRoom.model_construct(id="bath_master", type=RoomType.BATHROOM, x=13, y=4, width=3, height=2, color="#CFD8DC"),
+        )
     ),
-    LayoutTemplate(
+    LayoutTemplate.model_construct(
         id="tpl_office_small",
         name="Small Office Suite",
         description="Workspace for a small team with meeting room.",
         width=12.0,
         height=8.0,
-        rooms=[
-            TemplateRoom(id="open_office", type=RoomType.LIVING_ROOM, x=0, y=0, width=8, height=8, color="#B3E5FC"), # Using Living as Open Office
-            TemplateRoom(id="meeting", type=RoomType.OFFICE, x=8, y=0, width=4, height=5, color="#C5CAE9"),
-            TemplateRoom(id="pantry", type=RoomType.KITCHEN, x=8, y=5, width=2, height=3, color="#FFCCBC"),
-            TemplateRoom(id="restroom", type=RoomType.BATHROOM, x=10, y=5, width=2, height=3, color="#CFD8DC"),
-        ]
+        rooms=(
+            TemplateRoom.model_construct(id="open_office", type=RoomType.LIVING_ROOM, x=0, y=0, width=8, height=8, color="#B3E5FC"), # Using Living as Open Office
+            TemplateRoom.model_construct(id="meeting", type=RoomType.OFFICE, x=8, y=0, width=4, height=5, color="#C5CAE9"),
+            TemplateRoom.model_construct(id="pantry", type=RoomType.KITCHEN, x=8, y=5, width=2, height=3, color="#FFCCBC"),
+            TemplateRoom.model_construct(id="restroom", type=RoomType.BATHROOM, x=10, y=5, width=2, height=3, color="#CFD8DC"),
+        )
     ),
-    LayoutTemplate(
+    LayoutTemplate.model_construct(
         id="tpl_studio",
         name="Compact Studio",
         description="Open plan studio apartment.",
         width=6.0,
         height=8.0,
-        rooms=[
-            TemplateRoom(id="main", type=RoomType.LIVING_ROOM, x=0, y=2, width=6, height=6, color="#FFE0B2"), # Combined living/sleeping
-            TemplateRoom(id="kitchen", type=RoomType.KITCHEN, x=0, y=0, width=3, height=2, color="#FFCCBC"),
-            TemplateRoom(id="bath", type=RoomType.BATHROOM, x=3, y=0, width=3, height=2, color="#CFD8DC"),
-        ]
+        rooms=(
+            TemplateRoom.model_construct(id="main", type=RoomType.LIVING_ROOM, x=0, y=2, width=6, height=6, color="#FFE0B2"), # Combined living/sleeping
+            TemplateRoom.model_construct(id="kitchen", type=RoomType.KITCHEN, x=0, y=0, width=3, height=2, color="#FFCCBC"),
+            TemplateRoom.model_construct(id="bath", type=RoomType.BATHROOM, x=3, y=0, width=3, height=2, color="#CFD8DC"),
+        )
     )
 ]
 
 class TemplateService:
+    def __init__(self, templates: List[LayoutTemplate] = TEMPLATES, cache_size: int = settings.TEMPLATE_CACHE_SIZE):
+        self.templates = templates
+        self._templates_by_id = {template.id: template for template in templates}
+        # Room type histograms don't change per request, so build them once
+        self._template_counts = [(template, template.get_room_counts()) for template in templates]
+        # Matching only depends on the room type histogram and rendering only on the template,
+        # so both are memoized on hashable keys.
+        self._match_cached = lru_cache(maxsize=cache_size)(self._match_counts)
+        self._render_cached = lru_cache(maxsize=cache_size)(self._render_svg_by_id)
+
+    def clear_cache(self):
+        """
+        Invalidate memoized matches and SVGs (call after the template library changes).
+        """
+        self._templates_by_id = {template.id: template for template in self.templates}
+        self._template_counts = [(template, template.get_room_counts()) for template in self.templates]
+        self._match_cached.cache_clear()
+        self._render_cached.cache_clear()
+
+    def warmup(self):
+        """
+        Pre-render every template's SVG into the memo cache.
+        """
+        for template in self.templates:
+            self.render_svg(template)
+
     def find_best_match(self, program: ArchitecturalProgram) -> Optional[LayoutTemplate]:
         """
         Simple heuristic matching based on room types and counts.
         """
-        required_counts = {}
-        for room in program.rooms:
-            required_counts[room.type] = required_counts.get(room.type, 0) + 1
-            
+        return self._match_cached(tuple(_count_room_types(program.rooms)))
+
+    def _match_counts(self, required_counts: Tuple[int, ...]) -> Optional[LayoutTemplate]:
         best_template = None
         max_score = -1
+        required = [(idx, count) for idx, count in enumerate(required_counts) if count]
         
-        for template in TEMPLATES:
-            tpl_counts = template.get_room_counts()
+        for template, tpl_counts in self._template_counts:
             score = 0
             
             # Score based on matching room types present
-            for r_type, count in required_counts.items():
-                if r_type in tpl_counts:
-                    # If template has enough of this room type
-                    if tpl_counts[r_type] >= count:
-                        score += 2
-                    else:
-                        score += 1 # Partial match
-                else:
+            for idx, count in required:
+                tpl_count = tpl_counts[idx]
+                if tpl_count == 0:
                     score -= 1 # Missing required room
+                elif tpl_count >= count:
+                    score += 2 # Template has enough of this room type
+                else:
+                    score += 1 # Partial match
             
             # Penalize for extra rooms in template that weren't asked for? 
             # Maybe not for MVP, users might like bonus rooms.
@@ -141,30 +195,38 @@ class TemplateService:
         """
         Generates a simple SVG representation of the template.
         """
+        if self._templates_by_id.get(template.id) is template:
+            return self._render_cached(template.id)
+        return self._render(template)
+
+    def _render_svg_by_id(self, template_id: str) -> str:
+        return self._render(self._templates_by_id[template_id])
+
+    def _render(self, template: LayoutTemplate) -> str:
         scale = 50 # pixels per meter
         width_px = template.width * scale
         height_px = template.height * scale
         
-        svg_parts = [
-            f'<svg width="{width_px}" height="{height_px}" viewBox="0 0 {width_px} {height_px}" xmlns="http://www.w3.org/2000/svg" style="background-color: #f5f5f5;">'
-        ]
+        # Write straight into one buffer instead of collecting parts for a join
+        buf = io.StringIO()
+        w = buf.write
+        w(f'<svg width="{width_px}" height="{height_px}" viewBox="0 0 {width_px} {height_px}" xmlns="http://www.w3.org/2000/svg" style="background-color: #f5f5f5;">\n')
+        
+        # Scale all rooms and compute label centers in one pass
+        coords = template.room_rects() * scale
+        centers = coords[:, :2] + coords[:, 2:] * 0.5
         
         # Draw rooms
-        for room in template.rooms:
-            x = room.x * scale
-            y = room.y * scale
-            w = room.width * scale
-            h = room.height * scale
-            
-            rect = f'<rect x="{x}" y="{y}" width="{w}" height="{h}" fill="{room.color}" stroke="#333" stroke-width="2" />'
-            text_x = x + w/2
-            text_y = y + h/2
-            text = f'<text x="{text_x}" y="{text_y}" font-family="Arial" font-size="14" text-anchor="middle" fill="#333">{room.type.value.replace("_", " ").title()}</text>'
-            
-            svg_parts.append(rect)
-            svg_parts.append(text)
-            
-        svg_parts.append('</svg>')
-        return "\n".join(svg_parts)
+        for room, rect, center in zip(template.rooms, coords.tolist(), centers.tolist()):
+            self._render_room(w, room, rect, center)
+        w('</svg>')
+        return buf.getvalue()
+
+    def _render_room(self, write: Callable[[str], int], room: TemplateRoom, rect: List[float], center: List[float]) -> None:
+        x, y, w, h = rect
+        text_x, text_y = center
+        
+        write(f'<rect x="{x}" y="{y}" width="{w}" height="{h}" fill="{room.color}" stroke="#333" stroke-width="2" />\n')
+        write(f'<text x="{text_x}" y="{text_y}" font-family="Arial" font-size="14" text-anchor="middle" fill="#333">{_ROOM_TYPE_LABEL[room.type]}</text>\n')
 
 template_service = TemplateService()
@@ -2,29 +2,42 @@ from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sess
 from sqlalchemy.orm import DeclarativeBase
 from app.config import settings
 
-# Create async engine
 # Note: DATABASE_URL should start with postgresql+asyncpg://
+_ASYNC_URL = settings.DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://")
+
+# Create async engine
 engine = create_async_engine(
-    settings.DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://"),
-    echo=True,
-    future=True
+    _ASYNC_URL,
+    echo=settings.SQL_ECHO, # Statement logging is expensive, keep it to debug runs
+    echo_pool=False,
+    future=True,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_pre_ping=True,
+    # Postgres JIT only adds planning latency for our small OLTP queries
+    connect_args={"server_settings": {"jit": "off"}}
 )
 
 # Create async session factory
 AsyncSessionLocal = async_sessionmaker(
     engine, 
     class_=AsyncSession, 
-    expire_on_commit=False
+    expire_on_commit=False,
+    autoflush=False # Endpoints control their own flush/commit points
 )
 
 # Base class for models
 class Base(DeclarativeBase):
     pass
 
-# Dependency for FastAPI endpoints
+# Dependency for FastAPI endpoints (reads). The session is closed, returning its connection, on exit
 async def get_db():
     async with AsyncSessionLocal() as session:
-        try:
+        yield session
+
+# Dependency for write endpoints: one transaction, committed on success and rolled back on error.
+# Use with Depends(get_db_tx, scope="function") so the commit happens before the response is sent.
+async def get_db_tx():
+    async with AsyncSessionLocal() as session:
+        async with session.begin():
             yield session
-        finally:
-            await session.close()
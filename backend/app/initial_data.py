@@ -10,7 +10,7 @@ sys.path.append(str(backend_dir))
 from app.database import AsyncSessionLocal
 from app.models.user import User
 from app.core.security import get_password_hash
-from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -20,20 +20,24 @@ async def create_initial_data() -> None:
         try:
             logger.info("Creating initial data")
             
-            # Check if user exists
-            result = await session.execute(select(User).filter(User.email == "admin@example.com"))
-            user = result.scalars().first()
-            
-            if not user:
-                user = User(
+            # Insert the superuser in one roundtrip; an existing row (or a concurrent bootstrap) is left untouched
+            stmt = (
+                pg_insert(User)
+                .values(
                     email="admin@example.com",
                     hashed_password=get_password_hash("password"),
                     full_name="Admin User",
                     is_superuser=True,
                     is_active=True,
                 )
-                session.add(user)
-                await session.commit()
+                .on_conflict_do_nothing(index_elements=["email"])
+                .returning(User.id)
+            )
+            result = await session.execute(stmt)
+            created = result.scalar_one_or_none() is not None
+            await session.commit()
+            
+            if created:
                 logger.info("Superuser created")
             else:
                 logger.info("Superuser already exists")
@@ -1,8 +1,31 @@
-from fastapi import FastAPI
+import asyncio
+from typing import Dict
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
+from anyio import to_thread
 from app.config import settings
+from app.api.v1.api import api_router
+from app.api import deps
+from app.models.user import User
+from app.core.llm import llm_parser
+from app.core.cache import cache
+from app.core.templates import template_service
+from app.services.ml_inference import ml_service
 from contextlib import asynccontextmanager
 
+async def warmup(app: FastAPI):
+    """
+    Load the ML models and prime the template caches in worker threads,
+    so the first generation request doesn't pay the cold start.
+    """
+    try:
+        await to_thread.run_sync(ml_service.load_models)
+        await to_thread.run_sync(template_service.warmup)
+    except Exception as e:
+        print(f"Warmup failed: {e}. Models will load on first request.")
+    app.state.ready = True
+    print("Warmup complete.")
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup: Connect to DB, Redis, etc.
@@ -10,14 +33,17 @@ async def lifespan(app: FastAPI):
     key = settings.OPENAI_API_KEY or ""
     suffix = key[-4:] if len(key) >= 4 else ""
     print(f"OPENAI_API_KEY loaded (suffix): {suffix}")
+    # Threadpool used for CPU-bound work (template matching, SVG, GLB extrusion)
+    to_thread.current_default_thread_limiter().total_tokens = settings.THREADPOOL_SIZE
+    # Warm up in the background; /healthz/ready reports 503 until done
+    app.state.ready = False
+    warmup_task = asyncio.create_task(warmup(app))
     yield
     # Shutdown: Close connections
     print("Shutting down ARchitectureAI...")
-
-from app.api.v1.api import api_router
-from app.api import deps
-from app.models.user import User
-import os
+    warmup_task.cancel()
+    await llm_parser.close()
+    await cache.close()
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -46,10 +72,20 @@ if settings.BACKEND_CORS_ORIGINS:
 
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
+# JSON routes declare a response model / return type so FastAPI serializes them
+# straight to bytes with Pydantic (faster than a custom ORJSONResponse class)
 @app.get("/")
-async def root():
+async def root() -> Dict[str, str]:
     return {"message": "Welcome to ARchitectureAI API"}
 
 @app.get("/health")
-async def health_check():
+async def health_check() -> Dict[str, str]:
     return {"status": "healthy"}
+
+@app.get("/healthz/ready")
+async def readiness_check(response: Response) -> Dict[str, str]:
+    # Lets load balancers hold traffic until models are loaded
+    if not getattr(app.state, "ready", False):
+        response.status_code = 503
+        return {"status": "warming_up"}
+    return {"status": "ready"}
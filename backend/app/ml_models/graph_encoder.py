@@ -1,40 +1,95 @@
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
-from torch_geometric.nn import GATConv, global_mean_pool
+from torch_geometric.nn import GATConv, FusedGATConv, global_mean_pool
+from torch_geometric.utils import add_self_loops, remove_self_loops
+
+try:
+    from dgNN.operators import GATConvFuse
+    FUSED_GAT_AVAILABLE = True
+except ImportError:
+    FUSED_GAT_AVAILABLE = False
+
+def _with_self_loops(edge_index, num_nodes):
+    # GATConv's default preprocessing: drop existing self-loops, then add one per node
+    edge_index, _ = remove_self_loops(edge_index)
+    edge_index, _ = add_self_loops(edge_index, num_nodes=num_nodes)
+    return edge_index
+
+class FusedGATLayer(GATConv):
+    """
+    GATConv whose edge softmax and aggregation run as a single dgNN kernel (CUDA only).
+    Attention coefficients are recomputed in backward instead of stored per edge.
+    Parameters are identical to GATConv, so checkpoints load into either layer.
+    Self-loops are never added here; the graph passed in must already contain them.
+    """
+    @staticmethod
+    def to_graph_format(edge_index, num_nodes):
+        # Expects self-loops already added; returns the CSR/CSC layout the kernel takes
+        return FusedGATConv.to_graph_format(edge_index, size=(num_nodes, num_nodes))
+
+    def forward(self, x, graph):
+        (rowptr, col), (row, colptr), perm = graph
+        H, C = self.heads, self.out_channels
+        x = self.lin(x).view(-1, H, C)
+        
+        alpha_src = (x * self.att_src).sum(dim=-1)
+        alpha_dst = (x * self.att_dst).sum(dim=-1)
+        dropout = self.dropout if self.training else 0.0
+        
+        out = GATConvFuse(alpha_dst, alpha_src, rowptr, col, colptr, row, perm, self.negative_slope, x, dropout)
+        out = out.view(-1, H * C) if self.concat else out.mean(dim=1)
+        if self.bias is not None:
+            out = out + self.bias
+        return out
 
 class ConstraintGraphEncoder(nn.Module):
     """
     Graph Neural Network to encode the architectural constraint graph 
     into a latent vector representation.
     """
-    def __init__(self, node_dim=64, hidden_dim=128, out_dim=256, heads=4):
+    def __init__(self, node_dim=64, hidden_dim=128, out_dim=256, heads=4, fused=False):
         super(ConstraintGraphEncoder, self).__init__()
         
+        if fused and not FUSED_GAT_AVAILABLE:
+            print("WARNING: dgNN not found, using unfused GATConv.")
+        self.fused = fused and FUSED_GAT_AVAILABLE
+        
         self.node_embedding = nn.Linear(node_dim, hidden_dim)
         
-        # Graph Attention Layers
-        self.gat1 = GATConv(hidden_dim, hidden_dim, heads=heads, concat=True)
-        self.gat2 = GATConv(hidden_dim * heads, hidden_dim, heads=1, concat=False)
+        # Graph Attention Layers. Self-loops are added once per forward and shared by both layers
+        conv = FusedGATLayer if self.fused else GATConv
+        self.gat1 = conv(hidden_dim, hidden_dim, heads=heads, concat=True, add_self_loops=False)
+        self.gat2 = conv(hidden_dim * heads, hidden_dim, heads=1, concat=False, add_self_loops=False)
         
         # Output projection
         self.fc_out = nn.Linear(hidden_dim, out_dim)
         
-    def forward(self, x, edge_index, edge_attr=None, batch=None):
+    def forward(self, x, edge_index, edge_attr=None, batch=None, return_nodes=False):
         # x: Node features [num_nodes, node_dim]
         # edge_index: Graph connectivity [2, num_edges]
+        # return_nodes: per-node embeddings [num_nodes, out_dim] instead of per-graph ones
+        
+        # Graph preprocessing is shared by both layers: self-loops, plus CSR/CSC for the fused kernel
+        graph = _with_self_loops(edge_index, x.size(0))
+        if self.fused:
+            graph = FusedGATLayer.to_graph_format(graph, x.size(0))
         
         x = F.relu(self.node_embedding(x))
         
         # GAT Layers
         x = F.dropout(x, p=0.2, training=self.training)
-        x = self.gat1(x, edge_index)
+        x = self.gat1(x, graph)
         x = F.elu(x)
         
         x = F.dropout(x, p=0.2, training=self.training)
-        x = self.gat2(x, edge_index)
+        x = self.gat2(x, graph)
         x = F.elu(x)
         
+        if return_nodes:
+            # fc_out is affine, so the per-graph mean of these equals the pooled output
+            return self.fc_out(x)
+        
         # Global Pooling (get graph-level embedding)
         if batch is None:
             batch = torch.zeros(x.size(0), dtype=torch.long, device=x.device)
@@ -1,8 +1,9 @@
 import networkx as nx
-from typing import Dict, Any
+from typing import Dict, Any, List
 
 try:
     import torch
+    from torch_geometric.data import Data
     from torch_geometric.utils import from_networkx
     TORCH_AVAILABLE = True
 except ImportError:
@@ -21,6 +22,24 @@ ROOM_TYPES = {
     "storage": 8,
     "other": 9
 }
+_OTHER_IDX = ROOM_TYPES["other"]
+
+if TORCH_AVAILABLE:
+    # Row i is the one-hot encoding of room type index i
+    _ONE_HOT = torch.eye(len(ROOM_TYPES), dtype=torch.float32)
+
+def _node_area(data: Dict[str, Any]) -> float:
+    # Training used: area_norm = area / 50.0
+    # If min/max area is provided, use average, otherwise default
+    min_area = data.get("min_area")
+    max_area = data.get("max_area")
+    
+    # A 0.0 area is a real value, only None means unspecified
+    if min_area is not None and max_area is not None:
+        return (min_area + max_area) / 2.0
+    elif min_area is not None:
+        return min_area
+    return 15.0 # Default
 
 def convert_nx_to_pyg_data(G: nx.Graph):
     """
@@ -35,56 +54,50 @@ def convert_nx_to_pyg_data(G: nx.Graph):
     
     for node_id, data in G.nodes(data=True):
         # Map string type to index
-        r_type = data.get("type", "other")
-        # Handle potential mismatch in naming conventions if any
-        if r_type not in ROOM_TYPES:
-            r_type = "other"
-        
-        data['type_idx'] = ROOM_TYPES[r_type]
+        # Unknown types (naming mismatches) fall back to "other"
+        data['type_idx'] = ROOM_TYPES.get(data.get("type"), _OTHER_IDX)
         
         # Handle area (normalize as in training)
-        # Training used: area_norm = area / 50.0
-        # If min/max area is provided, use average, otherwise default
-        min_area = data.get("min_area")
-        max_area = data.get("max_area")
-        
-        if min_area and max_area:
-            area = (min_area + max_area) / 2.0
-        elif min_area:
-            area = min_area
-        else:
-            area = 15.0 # Default
-            
-        data['area'] = area
+        data['area'] = _node_area(data)
 
-    # 2. Build Feature Matrix x
-    x = []
-    # Note: G.nodes(data=True) order is preserved by from_networkx usually, 
-    # but let's be careful. from_networkx uses canonical ordering if not specified.
-    # It relies on list(G.nodes()).
-    
-    nodes_list = list(G.nodes(data=True))
+    # 2. Convert to PyG
+    # Grouping the feature attributes lets from_networkx build them in the same
+    # node order it uses for edge_index, so rows of x always line up with the edges.
+    data = from_networkx(G, group_node_attrs=['type_idx', 'area'])
     
-    for node in nodes_list:
-        type_idx = node[1]['type_idx']
-        one_hot = [0] * len(ROOM_TYPES)
-        one_hot[type_idx] = 1
-        
-        area_norm = node[1]['area'] / 50.0 
-        x.append(one_hot + [area_norm])
-        
-    x = torch.tensor(x, dtype=torch.float)
+    # 3. Build Feature Matrix x: one-hot room type + normalized area
+    type_ids = data.x[:, 0].long()
+    data.x = torch.cat([_ONE_HOT[type_ids], data.x[:, 1:] / 50.0], dim=1)
     
-    # 3. Convert to PyG
-    # We must ensure from_networkx follows the same node order
-    # It does not automatically align with our 'x' list if we just iterate G.nodes().
-    # We should probably assign features to the graph first or be explicit.
+    return data
+
+def convert_node_link_to_pyg_data(graph_data: Dict[str, Any]):
+    """
+    Build the same PyG Data as convert_nx_to_pyg_data(nx.node_link_graph(graph_data)) straight from
+    the node-link dict, without the NetworkX round trip. The dict is not modified.
+    """
+    if not TORCH_AVAILABLE:
+        raise RuntimeError("PyTorch is not available. Cannot convert to PyG data.")
+
+    nodes: List[Dict[str, Any]] = graph_data["nodes"]
+    index = {node["id"]: i for i, node in enumerate(nodes)}
     
-    # Safer approach:
-    # Assign 'x' attribute to nodes then use from_networkx? 
-    # Or just rely on standard behavior: from_networkx iterates G.nodes()
+    # 1. Features: one-hot room type + normalized area
+    type_ids = torch.tensor([ROOM_TYPES.get(node.get("type"), _OTHER_IDX) for node in nodes], dtype=torch.long)
+    areas = torch.tensor([_node_area(node) for node in nodes], dtype=torch.float32)
+    x = torch.cat([_ONE_HOT[type_ids], areas[:, None] / 50.0], dim=1)
     
-    data = from_networkx(G)
-    data.x = x
+    # 2. Edges in both directions, ordered like from_networkx on the undirected graph
+    # (per node, neighbors in insertion order) so message passing sums in the same order
+    neighbors: List[List[int]] = [[] for _ in nodes]
+    for edge in graph_data.get("edges", graph_data.get("links", [])):
+        u, v = index[edge["source"]], index[edge["target"]]
+        if v not in neighbors[u]:
+            neighbors[u].append(v)
+            if u != v:
+                neighbors[v].append(u)
+    sources = [u for u, adj in enumerate(neighbors) for _ in adj]
+    targets = [v for adj in neighbors for v in adj]
+    edge_index = torch.tensor([sources, targets], dtype=torch.long).view(2, -1)
     
-    return data
+    return Data(x=x, edge_index=edge_index)
@@ -17,6 +17,9 @@ class RoomType(str, Enum):
     ENTRANCE = "entrance"
     OTHER = "other"
 
+# Stable integer index per room type, for fixed-size count arrays
+ROOM_TYPE_IDX = {t: i for i, t in enumerate(RoomType)}
+
 class AdjacencyType(str, Enum):
     DIRECT = "direct" # Connected by door or opening
     ADJACENT = "adjacent" # Share a wall, no direct access necessary
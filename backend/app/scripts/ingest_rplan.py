@@ -2,7 +2,7 @@ import asyncio
 import os
 import sys
 import json
-import random
+import numpy as np
 from pathlib import Path
 
 # Add backend directory to sys.path
@@ -27,12 +27,18 @@ async def ingest_synthetic_rplan_data(limit: int = 100):
             # For this script we assume user ID 1 exists or we simulate it
             # In a real script we'd create a system user
             
+            # Draw all synthetic metadata and embeddings up front in C instead of per row in Python
+            rng = np.random.default_rng()
+            room_counts = rng.integers(3, 9, size=limit).tolist()
+            areas = rng.integers(40, 151, size=limit).tolist()
+            embeddings = rng.random((limit, 256), dtype=np.float32)
+            
             # Create synthetic data
             for i in range(limit):
                 # 1. Simulate RPLAN Metadata
                 rplan_id = f"rplan_{i}"
-                num_rooms = random.randint(3, 8)
-                area = random.randint(40, 150)
+                num_rooms = room_counts[i]
+                area = areas[i]
                 
                 # 2. Create Layout Record (Historical Data)
                 # We store this as a 'completed' layout to serve as training data / reference
@@ -46,7 +52,7 @@ async def ingest_synthetic_rplan_data(limit: int = 100):
                     "original_id": rplan_id,
                     "num_rooms": num_rooms,
                     "total_area": area,
-                    "graph_embedding": [random.random() for _ in range(256)] # Simulated embedding
+                    "graph_embedding": embeddings[i] # Simulated embedding (row view, no copy)
                 }
                 
                 if i % 10 == 0:
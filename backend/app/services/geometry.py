@@ -1,97 +1,138 @@
+import base64
+import json
+import struct
 import numpy as np
+from dataclasses import dataclass
 from typing import List, Dict, Any
-import io
+from app.schemas.architecture import RoomType, ROOM_TYPE_IDX
 
-try:
-    import trimesh
-    TRIMESH_AVAILABLE = True
-except ImportError as e:
-    print(f"WARNING: Trimesh/Shapely import failed: {e}. 3D generation will be disabled.")
-    TRIMESH_AVAILABLE = False
-except AttributeError as e:
-    # Catch weird attribute errors like the shapely _ARRAY_API one
-    print(f"WARNING: Trimesh/Shapely initialization failed: {e}. 3D generation will be disabled.")
-    TRIMESH_AVAILABLE = False
+# RGBA floor color per room type, in RoomType declaration order, plus a default row at the end
+_ROOM_COLORS = {
+    RoomType.LIVING_ROOM: [255, 204, 128, 255], # Orange
+    RoomType.KITCHEN: [239, 154, 154, 255],    # Red
+    RoomType.BEDROOM: [144, 202, 249, 255],    # Blue
+    RoomType.BATHROOM: [129, 199, 132, 255],   # Green
+    RoomType.BALCONY: [176, 190, 197, 255],    # Grey
+    RoomType.ENTRANCE: [255, 245, 157, 255],   # Yellow
+    RoomType.CORRIDOR: [224, 224, 224, 255],
+    RoomType.OTHER: [206, 147, 216, 255]       # Purple
+}
+_DEFAULT_COLOR = [200, 200, 200, 255]
+_COLOR_LUT = np.array([_ROOM_COLORS.get(t, _DEFAULT_COLOR) for t in RoomType] + [_DEFAULT_COLOR], dtype=np.uint8)
+_DEFAULT_IDX = len(RoomType)
+_WALL_COLOR = np.array([200, 200, 200, 255], dtype=np.uint8)
+# Material rows: room type colors, the default, then walls
+_MATERIAL_LUT = np.vstack([_COLOR_LUT, _WALL_COLOR])
+_WALL_IDX = len(_COLOR_LUT)
+
+# Unit cube centered at the origin (same layout as trimesh.creation.box), shared by every box instance
+_UNIT_BOX_VERTICES = np.array([
+    [-0.5, -0.5, -0.5], [-0.5, -0.5, 0.5], [-0.5, 0.5, -0.5], [-0.5, 0.5, 0.5],
+    [0.5, -0.5, -0.5], [0.5, -0.5, 0.5], [0.5, 0.5, -0.5], [0.5, 0.5, 0.5]
+], dtype=np.float32)
+_UNIT_BOX_FACES = np.array([
+    [1, 3, 0], [4, 1, 0], [0, 3, 2], [2, 4, 0], [1, 7, 3], [5, 1, 4],
+    [5, 7, 1], [3, 7, 2], [6, 4, 2], [2, 7, 6], [6, 5, 4], [7, 5, 6]
+], dtype=np.uint8)
+_UNIT_BOX_BYTES = _UNIT_BOX_VERTICES.tobytes()
+_UNIT_BOX_FACE_BYTES = _UNIT_BOX_FACES.tobytes()
+
+# Minimal binary GLB (empty scene with one node) returned when extrusion fails.
+# Generated offline using minimal_glb.py to ensure we always have something to show.
+_FALLBACK_GLB = base64.b64decode(
+    "Z2xURgIAAABkAAAAUAAAAEpTT057ImFzc2V0Ijp7InZlcnNpb24iOiIyLjAifSwic2NlbmVzIjpbeyJub2RlcyI6WzBdfV0sIm5vZGVzIjpbeyJuYW1lIjoiUm9vdCJ9XX0gIA=="
+)
+
+# glTF 2.0 constants
+_GLB_MAGIC = b"glTF"
+_GLB_CHUNK_JSON = 0x4E4F534A
+_GLB_CHUNK_BIN = 0x004E4942
+_GL_UNSIGNED_BYTE = 5121
+_GL_FLOAT = 5126
+
+@dataclass
+class GeometryBatch:
+    """
+    Room footprints in structure-of-arrays form (2D "pixel" coordinates, one row per room).
+    """
+    ids: List[str]
+    types: np.ndarray # (N,) room type values
+    xy: np.ndarray # (N, 2) top-left corner
+    wh: np.ndarray # (N, 2) width, height
+    centers: np.ndarray # (N, 2) center x, y
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def from_records(cls, rooms_geometry: List[Dict[str, Any]]) -> "GeometryBatch":
+        """
+        Build from the per-room dicts produced by the layout generators.
+        """
+        coords = np.array(
+            [(r['x'], r['y'], r['width'], r['height'], r['center_x'], r['center_y']) for r in rooms_geometry],
+            dtype=np.float32
+        ).reshape(-1, 6)
+        return cls(
+            ids=[r['id'] for r in rooms_geometry],
+            types=np.array([r['type'] for r in rooms_geometry], dtype=object),
+            xy=coords[:, 0:2],
+            wh=coords[:, 2:4],
+            centers=coords[:, 4:6]
+        )
 
 class GeometryService:
-    def create_3d_model(self, rooms_geometry: List[Dict[str, Any]], height_meters: float = 3.0) -> bytes:
+    def create_3d_model(self, batch: GeometryBatch, height_meters: float = 3.0) -> bytes:
         """
         Extrudes 2D room geometry into a 3D GLB model.
         """
-        if not TRIMESH_AVAILABLE:
-            print("3D generation requested but Trimesh is unavailable.")
+        if not len(batch):
             return self._get_fallback_glb()
 
         try:
-            scene = trimesh.Scene()
-            
             # Floor base
             # We can calculate bounds to create a floor or just let rooms be floors
             
-            for room in rooms_geometry:
-                # Create floor mesh
-                # Scale down: The SVG coords are in pixels (e.g. 400, 300).
-                # We should scale them to meters for 3D. 
-                # Let's say 100 pixels = 1 meter for simplicity in this MVP visualization.
-                
-                scale_factor = 0.02 # 100px -> 2m, 50px -> 1m. Roughly.
-                
-                w = room['width'] * scale_factor
-                d = room['height'] * scale_factor # Depth in 3D (Z or Y)
-                x = room['center_x'] * scale_factor
-                z = room['center_y'] * scale_factor # Map 2D Y to 3D Z (top-down view)
-                
+            # Scale down: The SVG coords are in pixels (e.g. 400, 300).
+            # We should scale them to meters for 3D. 
+            # Let's say 100 pixels = 1 meter for simplicity in this MVP visualization.
+            scale_factor = 0.02 # 100px -> 2m, 50px -> 1m. Roughly.
+            
+            # Width/depth (2D Y maps to 3D Z, top-down view) and centers for all rooms at once
+            w, d = (batch.wh * scale_factor).astype(np.float64).T
+            x, z = (batch.centers * scale_factor).astype(np.float64).T
+            
+            wall_thickness = 0.2
+            wall_height = height_meters
+            t = np.full_like(w, wall_thickness)
+            h = np.full_like(w, wall_height)
+            
+            # Every room is 5 boxes (floor + 4 walls): (rooms, 5, 3) extents [x, y, z] and centers.
+            # Y is up, the floor sits at Y=0
+            extents = np.stack([
                 # Floor Box
-                # trimesh.creation.box(extents) centers at origin
-                floor_box = trimesh.creation.box(extents=[w, 0.2, d])
-                
-                # Move to position
-                # Y is up. Floor is at Y=0.
-                translation = [x, 0.1, z] 
-                floor_box.apply_translation(translation)
-                
-                # Color based on room type
-                color = self._get_room_color_rgba(room['type'])
-                floor_box.visual.face_colors = color
-                
-                scene.add_geometry(floor_box)
-                
-                # Walls (Procedural)
-                # Create 4 walls
-                wall_thickness = 0.2
-                wall_height = height_meters
-                
-                # Extents: [x, y, z]
-                
+                np.stack([w, np.full_like(w, 0.2), d], axis=-1),
                 # North/South Walls (along X axis)
-                wall_ns_extents = [w + wall_thickness*2, wall_height, wall_thickness]
-                
-                wall_n = trimesh.creation.box(extents=wall_ns_extents)
-                wall_n.apply_translation([x, wall_height/2, z - d/2 - wall_thickness/2])
-                wall_n.visual.face_colors = [200, 200, 200, 255]
-                scene.add_geometry(wall_n)
-
-                wall_s = trimesh.creation.box(extents=wall_ns_extents)
-                wall_s.apply_translation([x, wall_height/2, z + d/2 + wall_thickness/2])
-                wall_s.visual.face_colors = [200, 200, 200, 255]
-                scene.add_geometry(wall_s)
-                
+                np.stack([w + t*2, h, t], axis=-1),
+                np.stack([w + t*2, h, t], axis=-1),
                 # East/West Walls (along Z axis)
-                wall_ew_extents = [wall_thickness, wall_height, d]
-                
-                wall_e = trimesh.creation.box(extents=wall_ew_extents)
-                wall_e.apply_translation([x + w/2 + wall_thickness/2, wall_height/2, z])
-                wall_e.visual.face_colors = [200, 200, 200, 255]
-                scene.add_geometry(wall_e)
-                
-                wall_w = trimesh.creation.box(extents=wall_ew_extents)
-                wall_w.apply_translation([x - w/2 - wall_thickness/2, wall_height/2, z])
-                wall_w.visual.face_colors = [200, 200, 200, 255]
-                scene.add_geometry(wall_w)
-                
-            # Export to GLB
-            glb_data = scene.export(file_type='glb')
-            return glb_data
+                np.stack([t, h, d], axis=-1),
+                np.stack([t, h, d], axis=-1),
+            ], axis=1)
+            box_centers = np.stack([
+                np.stack([x, np.full_like(w, 0.1), z], axis=-1),
+                np.stack([x, h/2, z - d/2 - t/2], axis=-1),
+                np.stack([x, h/2, z + d/2 + t/2], axis=-1),
+                np.stack([x + w/2 + t/2, h/2, z], axis=-1),
+                np.stack([x - w/2 - t/2, h/2, z], axis=-1),
+            ], axis=1)
+            
+            # Floor colored by room type, walls gray
+            box_materials = np.empty((len(batch), 5), dtype=np.int64)
+            box_materials[:, 0] = self._get_room_color_indices(batch.types)
+            box_materials[:, 1:] = _WALL_IDX
+            
+            return self._export_instanced_glb(extents.reshape(-1, 3), box_centers.reshape(-1, 3), box_materials.ravel())
         except Exception as e:
             print(f"Error during 3D generation: {e}")
             # Fallback to a simple 1x1x1 cube GLB if generation fails
@@ -99,32 +140,72 @@ class GeometryService:
             print("Returning fallback 3D model.")
             return self._get_fallback_glb()
 
-    def _get_fallback_glb(self) -> bytes:
-        # minimal binary GLB for a default cube (or empty scene)
-        # generated offline to ensure we always have something to show
-        import base64
-        # This is a base64 encoded minimal valid GLB (Empty scene with one node)
-        # Generated using: minimal_glb.py
-        MOCK_GLB_B64 = "Z2xURgIAAABkAAAAUAAAAEpTT057ImFzc2V0Ijp7InZlcnNpb24iOiIyLjAifSwic2NlbmVzIjpbeyJub2RlcyI6WzBdfV0sIm5vZGVzIjpbeyJuYW1lIjoiUm9vdCJ9XX0gIA=="
+    def _export_instanced_glb(self, scales: np.ndarray, translations: np.ndarray, materials: np.ndarray) -> bytes:
+        """
+        Writes boxes as a binary glTF that stores the unit cube once. Each material gets one node whose
+        EXT_mesh_gpu_instancing TRANSLATION/SCALE attributes place all of its boxes, so the payload is
+        24 bytes per box and the client issues one instanced draw call per color.
+        """
+        # Group boxes by material so every node's instances are one contiguous slice
+        order = np.argsort(materials, kind="stable")
+        used, starts, counts = np.unique(materials[order], return_index=True, return_counts=True)
+        translations = np.ascontiguousarray(translations[order], dtype=np.float32)
+        scales = np.ascontiguousarray(scales[order], dtype=np.float32)
         
-        try:
-            return base64.b64decode(MOCK_GLB_B64)
-        except Exception as e:
-            print(f"Error decoding fallback GLB: {e}")
-            return None
-
-    def _get_room_color_rgba(self, room_type: str) -> List[int]:
-        # RGB + Alpha
-        colors = {
-            "living_room": [255, 204, 128, 255], # Orange
-            "kitchen": [239, 154, 154, 255],    # Red
-            "bedroom": [144, 202, 249, 255],    # Blue
-            "bathroom": [129, 199, 132, 255],   # Green
-            "balcony": [176, 190, 197, 255],    # Grey
-            "entrance": [255, 245, 157, 255],   # Yellow
-            "corridor": [224, 224, 224, 255],
-            "other": [206, 147, 216, 255]       # Purple
+        # Binary chunk: cube positions, cube indices, then all translations and all scales. The
+        # per-box arrays are passed as byte views so the final join is the only copy of the payload.
+        blobs = [_UNIT_BOX_BYTES, _UNIT_BOX_FACE_BYTES, translations.data.cast("B"), scales.data.cast("B")]
+        buffer_views = []
+        offset = 0
+        for blob in blobs:
+            buffer_views.append({"buffer": 0, "byteOffset": offset, "byteLength": len(blob)})
+            offset += len(blob) # All blobs are multiples of 4 bytes, so views stay aligned
+        
+        accessors = [
+            {"bufferView": 0, "componentType": _GL_FLOAT, "count": 8, "type": "VEC3", "min": [-0.5] * 3, "max": [0.5] * 3},
+            {"bufferView": 1, "componentType": _GL_UNSIGNED_BYTE, "count": _UNIT_BOX_FACES.size, "type": "SCALAR"},
+        ]
+        materials_json, meshes, nodes = [], [], []
+        for i, (material, start, count) in enumerate(zip(used.tolist(), starts.tolist(), counts.tolist())):
+            for view in (2, 3):
+                accessors.append({"bufferView": view, "byteOffset": start * 12, "componentType": _GL_FLOAT, "count": count, "type": "VEC3"})
+            materials_json.append({"pbrMetallicRoughness": {"baseColorFactor": (_MATERIAL_LUT[material] / 255.0).tolist()}})
+            meshes.append({"primitives": [{"attributes": {"POSITION": 0}, "indices": 1, "material": i}]})
+            nodes.append({
+                "mesh": i,
+                "extensions": {"EXT_mesh_gpu_instancing": {"attributes": {"TRANSLATION": len(accessors) - 2, "SCALE": len(accessors) - 1}}}
+            })
+        
+        gltf = {
+            "asset": {"version": "2.0"},
+            "extensionsUsed": ["EXT_mesh_gpu_instancing"],
+            "extensionsRequired": ["EXT_mesh_gpu_instancing"],
+            "scene": 0,
+            "scenes": [{"nodes": list(range(len(nodes)))}],
+            "nodes": nodes,
+            "meshes": meshes,
+            "materials": materials_json,
+            "accessors": accessors,
+            "bufferViews": buffer_views,
+            "buffers": [{"byteLength": offset}],
         }
-        return colors.get(room_type, [200, 200, 200, 255])
+        json_chunk = json.dumps(gltf, separators=(",", ":")).encode()
+        json_chunk += b" " * (-len(json_chunk) % 4)
+        
+        total = 12 + 8 + len(json_chunk) + 8 + offset
+        return b"".join((
+            struct.pack("<4sII", _GLB_MAGIC, 2, total),
+            struct.pack("<II", len(json_chunk), _GLB_CHUNK_JSON), json_chunk,
+            struct.pack("<II", offset, _GLB_CHUNK_BIN), *blobs,
+        ))
+
+    def _get_fallback_glb(self) -> bytes:
+        # minimal binary GLB for a default cube (or empty scene), decoded once at import
+        return _FALLBACK_GLB
+
+    def _get_room_color_indices(self, room_types: np.ndarray) -> np.ndarray:
+        # Row of _COLOR_LUT (RGB + Alpha) per room. ROOM_TYPE_IDX rows line up with the LUT, and
+        # RoomType is a str enum, so plain type strings look up the same entries.
+        return np.fromiter((ROOM_TYPE_IDX.get(t, _DEFAULT_IDX) for t in room_types), dtype=np.int64, count=len(room_types))
 
 geometry_service = GeometryService()
@@ -1,12 +1,18 @@
 import os
+import math
+import threading
+import time
 import networkx as nx
 import numpy as np
-from typing import Dict, Any, List
+from collections import Counter, OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
 from pathlib import Path
-from app.ml_models.utils import convert_nx_to_pyg_data
+from app.config import settings
+from app.ml_models.utils import convert_node_link_to_pyg_data
 
 try:
     import torch
+    from torch_geometric.data import Batch
     from app.ml_models.graph_encoder import ConstraintGraphEncoder
     from app.ml_models.diffusion import LayoutDiffusionModel, DiffusionSampler
     TORCH_AVAILABLE = True
@@ -14,6 +20,176 @@ except ImportError:
     TORCH_AVAILABLE = False
     print("WARNING: PyTorch not found. ML inference will be disabled.")
 
+try:
+    from safetensors.torch import load_file as load_safetensors
+    SAFETENSORS_AVAILABLE = True
+except ImportError:
+    SAFETENSORS_AVAILABLE = False
+
+# Fixed dimensions from training: 8 rooms * 4 coords [x, y, w, h]
+MAX_ROOMS = 8
+LAYOUT_DIM = MAX_ROOMS * 4
+
+_ROOM_COLORS = {
+    "living_room": "#FFCC80", # Orange
+    "kitchen": "#EF9A9A",    # Red
+    "bedroom": "#90CAF9",    # Blue
+    "bathroom": "#81C784",   # Green
+    "balcony": "#B0BEC5",    # Grey
+    "entrance": "#FFF59D",   # Yellow
+    "corridor": "#E0E0E0",
+    "other": "#CE93D8"       # Purple
+}
+
+# Generated layout SVG: fixed canvas, then one rect + label per room
+_SVG_HEADER = '<svg width="800" height="600" xmlns="http://www.w3.org/2000/svg" style="background-color: #f0f0f0;">'
+_ROOM_SVG_TEMPLATE = (
+    '<rect x="{x}" y="{y}" width="{w}" height="{h}" fill="{color}" stroke="black" stroke-width="2" fill-opacity="0.7" />'
+    '<text x="{text_x}" y="{text_y}" font-family="Arial" font-size="12" text-anchor="middle" fill="black">{name}</text>'
+)
+
+# Max relative L2 error of an int8-quantized model vs fp32 on the probe input before falling back to fp32
+INT8_MAX_DRIFT = 0.05
+
+# Near-hit lookups rank cached graphs by a cheap lower bound and run the (exponential) graph edit
+# distance on at most this many of them, all within one time budget (seconds)
+NEAR_HIT_MAX_CANDIDATES = 4
+NEAR_HIT_TIME_BUDGET = 0.05
+
+def _same_type(a: Dict[str, Any], b: Dict[str, Any]) -> bool:
+    return a.get("type") == b.get("type")
+
+def _graph_signature(graph_data: Dict[str, Any]) -> Tuple[Counter, Counter]:
+    # Room type and adjacency type multisets
+    edges = graph_data.get("edges", graph_data.get("links", []))
+    return Counter(node.get("type") for node in graph_data["nodes"]), Counter(edge.get("type") for edge in edges)
+
+def _signature_distance(a: Tuple[Counter, Counter], b: Tuple[Counter, Counter]) -> int:
+    # Lower bound on the typed edit distance: one substitution fixes at most one missing type on each side
+    return sum(
+        max(sum((counts_a - counts_b).values()), sum((counts_b - counts_a).values()))
+        for counts_a, counts_b in zip(a, b)
+    )
+
+class LayoutCache:
+    """
+    LRU cache of generated layouts keyed by constraint graph hash.
+    Each entry keeps the final result, the latent reached after the first
+    `DIFFUSION_REUSE_DEPTH` denoising steps, and the node-link graph used for near-hit matching.
+    """
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key: str, entry: Dict[str, Any]):
+        entry.setdefault("signature", _graph_signature(entry["graph"]))
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def find_near(self, graph_data: Dict[str, Any], max_ged: float) -> Optional[Dict[str, Any]]:
+        """
+        Return a cached entry within `max_ged` edits of the node-link graph (room and adjacency
+        types must match), or None. Entries are ranked by their type-signature lower bound
+        (most recently used first among ties); only the best NEAR_HIT_MAX_CANDIDATES run the
+        edit distance search, sharing NEAR_HIT_TIME_BUDGET. NetworkX graphs are kept on the entry.
+        """
+        if max_ged <= 0:
+            return None
+
+        signature = _graph_signature(graph_data)
+        candidates = []
+        for entry in reversed(self._entries.values()):
+            bound = _signature_distance(entry["signature"], signature)
+            if bound <= max_ged:
+                candidates.append((bound, entry))
+        candidates.sort(key=lambda candidate: candidate[0]) # Stable, so recency breaks ties
+
+        G = None
+        deadline = time.monotonic() + NEAR_HIT_TIME_BUDGET
+        for _, entry in candidates[:NEAR_HIT_MAX_CANDIDATES]:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            if G is None:
+                G = nx.node_link_graph(graph_data)
+            if "nx_graph" not in entry:
+                entry["nx_graph"] = nx.node_link_graph(entry["graph"])
+            distance = nx.graph_edit_distance(
+                entry["nx_graph"], G,
+                node_match=_same_type, edge_match=_same_type,
+                upper_bound=max_ged, timeout=remaining
+            )
+            if distance is not None and distance <= max_ged:
+                return entry
+        return None
+
+class TaylorSeerHook:
+    """
+    Feature cache for the denoising network (TaylorSeer-style).
+    Every `interval`-th call runs the real forward pass and updates finite-difference
+    Taylor factors of the output; the calls in between return a Taylor extrapolation
+    of the last computed outputs instead of running the module.
+    """
+    def __init__(self, interval: int, max_order: int = 1):
+        self.interval = max(interval, 1)
+        self.max_order = max_order
+        self.reset()
+
+    def reset(self):
+        # Call once per sampling trajectory
+        self.step = 0
+        self.last_update = 0
+        self.batch_size = None
+        self.taylor_factors = []
+
+    def attach(self, module):
+        forward = module.forward
+
+        def cached_forward(x, *args, **kwargs):
+            return self(forward, x, *args, **kwargs)
+
+        module.forward = cached_forward
+        return module
+
+    def __call__(self, forward, x, *args, **kwargs):
+        step = self.step
+        self.step += 1
+
+        # The batch grows when resumed trajectories join fresh ones, so factors must be rebuilt
+        if x.shape[0] != self.batch_size:
+            self.batch_size = x.shape[0]
+            self.taylor_factors = []
+
+        if step % self.interval == 0 or not self.taylor_factors:
+            out = forward(x, *args, **kwargs)
+            self._update(out, step)
+            return out
+        return self._predict(step)
+
+    def _update(self, out, step):
+        distance = step - self.last_update
+        factors = [out]
+        if distance > 0:
+            for order in range(min(self.max_order, len(self.taylor_factors))):
+                factors.append((factors[order] - self.taylor_factors[order]) / distance)
+        self.taylor_factors = factors
+        self.last_update = step
+
+    def _predict(self, step):
+        distance = step - self.last_update
+        out = self.taylor_factors[0]
+        for order in range(1, len(self.taylor_factors)):
+            out = out + self.taylor_factors[order] * (distance ** order) / math.factorial(order)
+        return out
+
 class MLInferenceService:
     def __init__(self):
         self.device = 'cpu'
@@ -25,167 +201,303 @@ class MLInferenceService:
         self.gnn = None
         self.diffusion = None
         self.sampler = None
+        self.feature_cache = None
         self.models_loaded = False
+        self._load_lock = threading.Lock() # Startup warmup and a first request may race to load
+        self._infer_lock = threading.Lock() # Requests run in threadpool workers; the caches and feature hook are shared
+        self.layout_cache = LayoutCache(maxsize=settings.DIFFUSION_CACHE_SIZE)
         
     def load_models(self):
         if not TORCH_AVAILABLE:
             print("Cannot load models: PyTorch is not available.")
             return
 
-        if self.models_loaded:
-            return
+        with self._load_lock:
+            if self.models_loaded:
+                return
+            self._load_models()
 
+    def _load_models(self):
         print(f"Loading ML Models from {self.base_path}...")
         
         # 1. Load GNN
         self.gnn = ConstraintGraphEncoder(node_dim=11, hidden_dim=64, out_dim=128).to(self.device)
-        gnn_path = self.base_path / "gnn_encoder_v1.pt"
-        if gnn_path.exists():
-            self.gnn.load_state_dict(torch.load(gnn_path, map_location=self.device))
-            self.gnn.eval()
+        if self._load_checkpoint(self.gnn, "gnn_encoder_v1"):
             print("GNN Encoder loaded.")
         else:
-            print(f"WARNING: GNN Checkpoint not found at {gnn_path}")
+            print(f"WARNING: GNN Checkpoint not found at {self.base_path / 'gnn_encoder_v1.pt'}")
 
         # 2. Load Diffusion
-        # Fixed dimensions from training
-        LAYOUT_DIM = 32 
         self.diffusion = LayoutDiffusionModel(input_dim=LAYOUT_DIM, condition_dim=128).to(self.device)
-        diff_path = self.base_path / "diffusion_v1.pt"
-        if diff_path.exists():
-            self.diffusion.load_state_dict(torch.load(diff_path, map_location=self.device))
-            self.diffusion.eval()
+        if self._load_checkpoint(self.diffusion, "diffusion_v1"):
             print("Diffusion Model loaded.")
         else:
-             print(f"WARNING: Diffusion Checkpoint not found at {diff_path}")
+             print(f"WARNING: Diffusion Checkpoint not found at {self.base_path / 'diffusion_v1.pt'}")
+            
+        # Reduced precision, A/B-able via ML_DTYPE
+        if settings.ML_DTYPE == "int8":
+            self._quantize_models()
+        elif settings.ML_DTYPE not in ("fp32", "bf16"):
+            print(f"WARNING: Unknown ML_DTYPE '{settings.ML_DTYPE}', using fp32.")
+            
+        # Cache the denoising MLP output across steps (no-op when the interval is 1)
+        self.feature_cache = TaylorSeerHook(settings.DIFFUSION_CACHE_INTERVAL)
+        if self.feature_cache.interval > 1:
+            self.feature_cache.attach(self.diffusion.net)
+            
+        if settings.ML_COMPILE:
+            self._compile_models()
             
-        self.sampler = DiffusionSampler(self.diffusion, device=self.device, n_steps=50) # Fewer steps for inference speed
+        self.sampler = DiffusionSampler(self.diffusion, device=self.device, n_steps=settings.DIFFUSION_STEPS) # Fewer steps for inference speed
         self.models_loaded = True
 
+    def _load_checkpoint(self, model, name: str) -> bool:
+        """
+        Loads <name>.safetensors when present (no unpickling, pages shared across workers),
+        otherwise memory-maps the <name>.pt state dict. Returns False if neither exists.
+        """
+        safetensors_path = self.base_path / f"{name}.safetensors"
+        pt_path = self.base_path / f"{name}.pt"
+        if SAFETENSORS_AVAILABLE and safetensors_path.exists():
+            state_dict = load_safetensors(str(safetensors_path), device=str(self.device))
+        elif pt_path.exists():
+            state_dict = torch.load(pt_path, map_location=self.device, mmap=True, weights_only=True)
+        else:
+            return False
+        # assign=True adopts the loaded tensors as the parameters instead of copying into fresh ones
+        model.load_state_dict(state_dict, assign=True)
+        model.eval()
+        return True
+
+    def _quantize_models(self):
+        """
+        Dynamic int8 quantization of the nn.Linear layers (CPU inference) in the GNN and the denoiser.
+        Each model is checked against its fp32 output on a fixed probe input and kept in fp32
+        if the relative drift exceeds INT8_MAX_DRIFT.
+        """
+        gen = torch.Generator().manual_seed(0)
+        num_nodes = 8
+        ring = torch.arange(num_nodes)
+        gnn_probe = (
+            torch.rand((num_nodes, 11), generator=gen),
+            torch.stack([torch.cat([ring, (ring + 1) % num_nodes]), torch.cat([(ring + 1) % num_nodes, ring])]),
+        )
+        diffusion_probe = (
+            torch.randn((4, LAYOUT_DIM), generator=gen),
+            torch.tensor([0, 10, 25, 49]),
+            torch.randn((4, 128), generator=gen),
+        )
+        self.gnn = self._quantize_checked(self.gnn, gnn_probe, "GNN Encoder")
+        self.diffusion = self._quantize_checked(self.diffusion, diffusion_probe, "Diffusion Model")
+
+    def _quantize_checked(self, model, probe, name: str):
+        quantized = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        with torch.inference_mode():
+            probe = tuple(t.to(self.device) for t in probe)
+            reference = model(*probe)
+            drift = ((quantized(*probe) - reference).norm() / reference.norm().clamp_min(1e-12)).item()
+        if drift > INT8_MAX_DRIFT:
+            print(f"WARNING: int8 {name} drifts {drift:.3f} from fp32 (max {INT8_MAX_DRIFT}), keeping fp32.")
+            return model
+        print(f"{name} quantized to int8 (drift {drift:.4f}).")
+        return quantized
+
+    def _compile_models(self):
+        """
+        torch.compile the GNN and denoiser, then run one dummy forward each so compilation
+        happens during startup warmup instead of on the first request. Falls back to eager on failure.
+        """
+        gnn, diffusion = self.gnn, self.diffusion
+        try:
+            self.gnn = torch.compile(gnn)
+            # The feature cache patches the denoising MLP's forward with Python-side state, which compiled graphs can't follow
+            if self.feature_cache.interval == 1:
+                self.diffusion = torch.compile(diffusion)
+            else:
+                print("WARNING: ML_COMPILE skips the diffusion model while DIFFUSION_CACHE_INTERVAL > 1.")
+            
+            with torch.inference_mode():
+                x = torch.zeros((2, 11), device=self.device)
+                edge_index = torch.tensor([[0, 1], [1, 0]], device=self.device)
+                batch = torch.zeros(2, dtype=torch.long, device=self.device)
+                condition = self.gnn(x, edge_index, batch=batch)
+                self.diffusion(torch.zeros((1, LAYOUT_DIM), device=self.device), torch.zeros(1, dtype=torch.long, device=self.device), condition)
+            print("ML models compiled.")
+        except Exception as e:
+            print(f"WARNING: torch.compile failed ({e}), using eager models.")
+            self.gnn, self.diffusion = gnn, diffusion
+
     def generate_layout(self, graph_data: dict) -> Dict[str, Any]:
         """
         Run full inference pipeline: Graph Dict -> NetworkX -> PyG -> GNN -> Diffusion -> SVG & Geometry
         """
+        return self.generate_layout_batch([graph_data])[0]
+
+    def generate_layout_batch(self, graphs: List[dict]) -> List[Dict[str, Any]]:
+        """
+        Run the inference pipeline for several graphs at once.
+        The GNN encodes all graphs in one forward pass and the diffusion sampler
+        denoises a single [batch, LAYOUT_DIM] tensor, so per-step overhead is paid once per batch.
+
+        Layouts are cached by constraint graph hash. Identical graphs return the cached layout,
+        near-identical graphs resume denoising from a cached intermediate latent and
+        skip the first `DIFFUSION_REUSE_DEPTH` steps.
+        """
         if not TORCH_AVAILABLE:
             raise RuntimeError("ML Inference is unavailable because PyTorch is not installed.")
 
         if not self.models_loaded:
             self.load_models()
             
-        # 1. Reconstruct NetworkX Graph from JSON dict
-        G = nx.node_link_graph(graph_data)
+        with self._infer_lock:
+            return self._generate_layout_batch(graphs)
+
+    def _generate_layout_batch(self, graphs: List[dict]) -> List[Dict[str, Any]]:
+        # 1. Cache keys from the node-link graph dicts (no NetworkX reconstruction needed)
+        keys = [graph_data.get("graph", {}).get("cache_key") for graph_data in graphs]
+        
+        # 2. Look up cached layouts
+        results: List[Optional[Dict[str, Any]]] = [None] * len(graphs)
+        full_idx, resume_idx, resume_latents = [], [], []
+        for i, (key, graph_data) in enumerate(zip(keys, graphs)):
+            entry = self.layout_cache.get(key) if key else None
+            if entry is not None:
+                results[i] = {
+                    "svg": entry["result"]["svg"],
+                    "geometry": [dict(room) for room in entry["result"]["geometry"]]
+                }
+                continue
+            
+            near = self.layout_cache.find_near(graph_data, settings.DIFFUSION_REUSE_MAX_GED)
+            if near is not None:
+                resume_idx.append(i)
+                resume_latents.append(near["latent"])
+            else:
+                full_idx.append(i)
         
-        # 2. Convert to PyG Data
-        pyg_data = convert_nx_to_pyg_data(G).to(self.device)
+        pending = full_idx + resume_idx
+        if not pending:
+            return results
         
-        # 3. Encode Graph
-        with torch.no_grad():
-            # batch vector of zeros since size is 1
-            batch = torch.zeros(pyg_data.num_nodes, dtype=torch.long, device=self.device)
-            condition = self.gnn(pyg_data.x, pyg_data.edge_index, batch=batch)
+        # 3. Encode Graphs -> [batch, condition_dim]
+        condition = self._encode_graphs([graphs[i] for i in pending])
         
         # 4. Run Diffusion Sampling
-        # Output shape: [1, 32] -> 8 rooms * 4 coords
-        with torch.no_grad():
-            layout_vector = self.sampler.sample(condition, (1, 32))
-            
-        # 5. Decode Vector to Geometry
-        geometry_data = self._vector_to_geometry(layout_vector[0].cpu().numpy(), G)
+        # Output shape: [batch, 32] -> 8 rooms * 4 coords each
+        n_steps = self.sampler.n_steps
+        reuse_step = n_steps - min(max(settings.DIFFUSION_REUSE_DEPTH, 0), n_steps)
+        self.feature_cache.reset()
+        # bf16 autocast covers the network's matmuls; the sampler update math stays in fp32
+        use_bf16 = settings.ML_DTYPE == "bf16"
+        with torch.inference_mode(), torch.autocast(device_type=self.device.type, dtype=torch.bfloat16, enabled=use_bf16):
+            # Fresh trajectories run their first steps on their own...
+            latents = []
+            if full_idx:
+                noise = torch.randn((len(full_idx), LAYOUT_DIM), device=self.device)
+                latents.append(self.sampler.denoise(noise, condition[:len(full_idx)], n_steps, reuse_step))
+            # ...then near-hits join them from their cached latents for the remaining steps
+            if resume_idx:
+                latents.append(torch.stack(resume_latents).to(self.device))
+            latent_r = torch.cat(latents)
+            layout_vectors = self.sampler.denoise(latent_r, condition, reuse_step)
+        layout_vectors = layout_vectors.cpu().numpy()
+        latent_r = latent_r.cpu()
         
-        # 6. Generate SVG from Geometry
-        svg_output = self._geometry_to_svg(geometry_data)
+        for j, i in enumerate(pending):
+            # 5. Decode Vector to Geometry
+            geometry_data = self._vector_to_geometry(layout_vectors[j], graphs[i]["nodes"])
+            
+            # 6. Generate SVG from Geometry
+            svg_output = self._geometry_to_svg(geometry_data)
+            
+            results[i] = {
+                "svg": svg_output,
+                "geometry": geometry_data
+            }
+            if keys[i]:
+                self.layout_cache.put(keys[i], {
+                    "result": {"svg": svg_output, "geometry": [dict(room) for room in geometry_data]},
+                    "latent": latent_r[j],
+                    "graph": graphs[i]
+                })
+        return results
+
+    def _encode_graphs(self, graphs: List[dict]) -> "torch.Tensor":
+        """
+        Encode node-link graphs with the GNN in a single batched forward pass.
+        """
+        data_list = [convert_node_link_to_pyg_data(graph_data) for graph_data in graphs]
+        pyg_batch = Batch.from_data_list(data_list).to(self.device)
         
-        return {
-            "svg": svg_output,
-            "geometry": geometry_data
-        }
+        with torch.inference_mode():
+            return self.gnn(pyg_batch.x, pyg_batch.edge_index, batch=pyg_batch.batch)
 
-    def _vector_to_geometry(self, layout_vec: np.ndarray, G: nx.Graph) -> List[Dict[str, Any]]:
+    def _vector_to_geometry(self, layout_vec: np.ndarray, nodes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """
-        Convert raw layout vector to structured geometry list.
+        Convert raw layout vector to structured geometry list (one room per node-link node, in order).
         """
         scale = 5.0 
         offset_x = 400
         offset_y = 300
         
-        nodes = list(G.nodes(data=True))
-        num_rooms = len(nodes)
+        num_rooms = min(len(nodes), MAX_ROOMS)
         
-        rooms_geometry = []
+        # One [x, y, w, h] box per room, all rooms at once
+        boxes = layout_vec[:num_rooms * 4].reshape(-1, 4)
+        
+        # Dimensions
+        w = np.abs(boxes[:, 2]) * scale + 20
+        h = np.abs(boxes[:, 3]) * scale + 20
+        
+        # Position (Center)
+        cx = boxes[:, 0] * scale + offset_x
+        cy = boxes[:, 1] * scale + offset_y
+        
+        # Top-Left for SVG/2D
+        x = cx - (w/2)
+        y = cy - (h/2)
+        
+        rooms_geometry = [
+            {
+                "id": node["id"],
+                "name": node.get('label', 'Room'),
+                "type": node.get('type', 'other'),
+                "x": x_i,
+                "y": y_i,
+                "width": w_i,
+                "height": h_i,
+                "center_x": cx_i,
+                "center_y": cy_i
+            }
+            for node, x_i, y_i, w_i, h_i, cx_i, cy_i
+            in zip(nodes, x.tolist(), y.tolist(), w.tolist(), h.tolist(), cx.tolist(), cy.tolist())
+        ]
         
-        for i in range(min(num_rooms, 8)):
-            # Extract box
-            base_idx = i * 4
-            x_raw, y_raw, w_raw, h_raw = layout_vec[base_idx:base_idx+4]
-            
-            # Dimensions
-            w = abs(w_raw) * scale + 20 
-            h = abs(h_raw) * scale + 20
-            
-            # Position (Center)
-            cx = x_raw * scale + offset_x
-            cy = y_raw * scale + offset_y
-            
-            # Top-Left for SVG/2D
-            x = cx - (w/2)
-            y = cy - (h/2)
-            
-            room_data = nodes[i][1]
-            
-            rooms_geometry.append({
-                "id": nodes[i][0],
-                "name": room_data.get('label', 'Room'),
-                "type": room_data.get('type', 'other'),
-                "x": float(x),
-                "y": float(y),
-                "width": float(w),
-                "height": float(h),
-                "center_x": float(cx),
-                "center_y": float(cy)
-            })
-            
         return rooms_geometry
 
     def _geometry_to_svg(self, geometry: List[Dict[str, Any]]) -> str:
         """
         Render structured geometry to SVG.
         """
-        svg_parts = [
-            f'<svg width="800" height="600" xmlns="http://www.w3.org/2000/svg" style="background-color: #f0f0f0;">'
-        ]
-        
-        for room in geometry:
-            x, y, w, h = room['x'], room['y'], room['width'], room['height']
-            color = self._get_room_color(room['type'])
-            
-            svg_parts.append(
-                f'<rect x="{x}" y="{y}" width="{w}" height="{h}" fill="{color}" stroke="black" stroke-width="2" fill-opacity="0.7" />'
-            )
-            svg_parts.append(
-                f'<text x="{x + w/2}" y="{y + h/2}" font-family="Arial" font-size="12" text-anchor="middle" fill="black">{room["name"]}</text>'
+        rooms = [
+            _ROOM_SVG_TEMPLATE.format(
+                x=room['x'], y=room['y'], w=room['width'], h=room['height'],
+                color=self._get_room_color(room['type']),
+                text_x=room['x'] + room['width']/2, text_y=room['y'] + room['height']/2,
+                name=room['name']
             )
-            
-        svg_parts.append('</svg>')
-        return "".join(svg_parts)
+            for room in geometry
+        ]
+        return "".join((_SVG_HEADER, *rooms, '</svg>'))
 
-    def _vector_to_svg(self, layout_vec: np.ndarray, G: nx.Graph) -> str:
+    def _vector_to_svg(self, layout_vec: np.ndarray, nodes: List[Dict[str, Any]]) -> str:
         # Legacy wrapper if needed, but we used it internally before.
         # Can be removed or redirected.
-        geom = self._vector_to_geometry(layout_vec, G)
+        geom = self._vector_to_geometry(layout_vec, nodes)
         return self._geometry_to_svg(geom)
 
 
     def _get_room_color(self, room_type: str) -> str:
-        colors = {
-            "living_room": "#FFCC80", # Orange
-            "kitchen": "#EF9A9A",    # Red
-            "bedroom": "#90CAF9",    # Blue
-            "bathroom": "#81C784",   # Green
-            "balcony": "#B0BEC5",    # Grey
-            "entrance": "#FFF59D",   # Yellow
-            "corridor": "#E0E0E0",
-            "other": "#CE93D8"       # Purple
-        }
-        return colors.get(room_type, "#FFFFFF")
+        return _ROOM_COLORS.get(room_type, "#FFFFFF")
 
 ml_service = MLInferenceService()
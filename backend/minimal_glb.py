@@ -1,7 +1,9 @@
 import struct
 import json
 import base64
+from functools import lru_cache
 
+@lru_cache(maxsize=1)
 def create_minimal_glb():
     # Minimal GLTF JSON
     # A single node, scene, and asset info. No meshes to keep it simple and valid.
@@ -17,6 +17,7 @@ sys.path.append(str(backend_dir))
 from fastapi.testclient import TestClient
 from app.main import app
 from app.core.templates import template_service
+from app.schemas.architecture import ArchitecturalProgram
 
 client = TestClient(app)
 
@@ -25,6 +26,18 @@ def test_health_check():
     assert response.status_code == 200
     assert response.json() == {"status": "healthy"}
 
+def test_readiness_after_warmup():
+    import time
+    # Readiness flips once the lifespan warmup has loaded models in the background
+    with TestClient(app) as warm_client:
+        for _ in range(120):
+            response = warm_client.get("/healthz/ready")
+            if response.status_code == 200:
+                break
+            assert response.status_code == 503
+            time.sleep(0.5)
+        assert response.json() == {"status": "ready"}
+
 def test_parse_prompt_mock():
     # We need to mock the authentication dependency since we don't have a running DB with users
     # For this test, we can override the dependency
@@ -74,6 +87,94 @@ def test_parse_prompt_mock():
         settings.OPENAI_API_KEY = original_api_key
         app.dependency_overrides = {}
 
+def test_parse_multi_mock():
+    from app.api.deps import get_current_active_user
+    from app.models.user import User
+    
+    async def mock_get_current_active_user():
+        return User(id=1, email="test@example.com", is_active=True)
+    
+    app.dependency_overrides[get_current_active_user] = mock_get_current_active_user
+    
+    from app.core.llm import llm_parser
+    from app.schemas.architecture import ArchitecturalProgram, Room, RoomType, GlobalConstraints, RoomConstraint
+    
+    async def mock_parse_prompt(text: str):
+        room_type = RoomType.KITCHEN if "kitchen" in text else RoomType.BEDROOM
+        return ArchitecturalProgram(
+            raw_prompt=text,
+            rooms=[Room(id="room1", name="Room", type=room_type, constraints=RoomConstraint(room_id="room1"))],
+            adjacencies=[],
+            global_constraints=GlobalConstraints(floors=1)
+        )
+    
+    original_parse = llm_parser.parse_prompt
+    llm_parser.parse_prompt = mock_parse_prompt
+    
+    from app.config import settings
+    original_api_key = settings.OPENAI_API_KEY
+    settings.OPENAI_API_KEY = "sk-fake-key-for-test"
+    
+    try:
+        response = client.post(
+            "/api/v1/parser/parse_multi",
+            json=[{"text": "a kitchen"}, {"text": "a bedroom"}]
+        )
+        assert response.status_code == 200
+        data = response.json()
+        # Order matches the submitted prompts
+        assert [d["raw_prompt"] for d in data] == ["a kitchen", "a bedroom"]
+        assert [d["rooms"][0]["type"] for d in data] == ["kitchen", "bedroom"]
+        
+        response = client.post("/api/v1/parser/parse_multi", json=[])
+        assert response.status_code == 400
+    finally:
+        llm_parser.parse_prompt = original_parse
+        settings.OPENAI_API_KEY = original_api_key
+        app.dependency_overrides = {}
+
+def test_parse_prompt_stream_mock():
+    import json
+    from app.api.deps import get_current_active_user
+    from app.models.user import User
+    
+    async def mock_get_current_active_user():
+        return User(id=1, email="test@example.com", is_active=True)
+    
+    app.dependency_overrides[get_current_active_user] = mock_get_current_active_user
+    
+    from app.core.llm import llm_parser
+    from app.schemas.architecture import ArchitecturalProgram, Room, RoomType, GlobalConstraints, RoomConstraint
+    
+    async def mock_parse_prompt_stream(text: str):
+        yield '{"rooms": ['
+        yield '...'
+        yield ArchitecturalProgram(
+            raw_prompt=text,
+            rooms=[Room(id="room1", name="Kitchen", type=RoomType.KITCHEN, constraints=RoomConstraint(room_id="room1"))],
+            adjacencies=[],
+            global_constraints=GlobalConstraints(floors=1)
+        )
+    
+    original_stream = llm_parser.parse_prompt_stream
+    llm_parser.parse_prompt_stream = mock_parse_prompt_stream
+    
+    from app.config import settings
+    original_api_key = settings.OPENAI_API_KEY
+    settings.OPENAI_API_KEY = "sk-fake-key-for-test"
+    
+    try:
+        response = client.post("/api/v1/parser/parse/stream", json={"text": "a kitchen"})
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/x-ndjson"
+        events = [json.loads(line) for line in response.text.splitlines()]
+        assert [e["delta"] for e in events[:-1]] == ['{"rooms": [', '...']
+        assert events[-1]["program"]["rooms"][0]["type"] == "kitchen"
+    finally:
+        llm_parser.parse_prompt_stream = original_stream
+        settings.OPENAI_API_KEY = original_api_key
+        app.dependency_overrides = {}
+
 def test_generate_baseline():
     # Mock auth
     from app.api.deps import get_current_active_user
@@ -112,9 +213,73 @@ def test_generate_baseline():
     assert "svg_content" in data
     assert "template_name" in data
     assert "Standard 1-Bedroom" in data["template_name"]
+    assert data["job_id"]
+
+    # GLB is streamed separately as binary glTF
+    glb_response = client.get(f"/api/v1/generation/{data['job_id']}/glb")
+    assert glb_response.status_code == 200
+    assert glb_response.headers["content-type"] == "model/gltf-binary"
+    assert glb_response.content[:4] == b"glTF"
+    # Every room of the matched template is extruded into a floor and four walls
+    from tests.test_geometry import instanced_boxes
+    template = template_service.find_best_match(ArchitecturalProgram.model_validate(program_data))
+    translations, scales = instanced_boxes(glb_response.content)
+    assert len(translations) == len(scales) == 5 * len(template.room_rects())
+
+    response = client.get("/api/v1/generation/unknown/glb")
+    assert response.status_code == 404
     
     app.dependency_overrides = {}
 
+def test_generate_diffusion_batch():
+    # Mock auth
+    from app.api.deps import get_current_active_user
+    from app.models.user import User
+
+    async def mock_get_current_active_user():
+        return User(id=1, email="test@example.com", is_active=True)
+
+    app.dependency_overrides[get_current_active_user] = mock_get_current_active_user
+
+    program_data = {
+        "rooms": [
+            {"id": "l1", "name": "Living", "type": "living_room", "constraints": {"room_id": "l1", "min_area": 20, "natural_light": True}},
+            {"id": "k1", "name": "Kitchen", "type": "kitchen", "constraints": {"room_id": "k1", "min_area": 10, "natural_light": True}}
+        ],
+        "adjacencies": [
+            {"room_id_a": "l1", "room_id_b": "k1", "type": "direct"}
+        ],
+        "global_constraints": {"floors": 1}
+    }
+    studio_data = {
+        "rooms": [
+            {"id": "s1", "name": "Studio", "type": "living_room", "constraints": {"room_id": "s1", "min_area": 25, "natural_light": True}}
+        ],
+        "adjacencies": [],
+        "global_constraints": {"floors": 1}
+    }
+
+    try:
+        response = client.post(
+            "/api/v1/generation/diffusion/batch",
+            json={"programs": [program_data, studio_data]}
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert len(data) == 2
+        for item in data:
+            assert "svg" in item["svg_content"]
+
+        if data[0]["template_id"] == "ai_generated_v1":
+            # Order is preserved: one rect per room of each program
+            assert data[0]["svg_content"].count("<rect") == 2
+            assert data[1]["svg_content"].count("<rect") == 1
+
+        response = client.post("/api/v1/generation/diffusion/batch", json={"programs": []})
+        assert response.status_code == 400
+    finally:
+        app.dependency_overrides = {}
+
 if __name__ == "__main__":
     # Simple manual runner if pytest not available
     try:
@@ -57,11 +57,14 @@ def test_diffusion_generation():
         print("Success!")
         print(f"Template Name: {data['template_name']}")
         print(f"SVG Length: {len(data['svg_content'])}")
-        if data.get('glb_content'):
-             print(f"GLB Length: {len(data['glb_content'])} (Base64)")
         print(f"Metadata: {data['metadata']}")
         assert "svg" in data['svg_content']
-        assert data['glb_content'] is not None
+        assert data['job_id'] is not None
+
+        glb_response = client.get(f"/api/v1/generation/{data['job_id']}/glb")
+        print(f"GLB Length: {len(glb_response.content)} bytes")
+        assert glb_response.status_code == 200
+        assert glb_response.headers["content-type"] == "model/gltf-binary"
 
 if __name__ == "__main__":
     test_diffusion_generation()
@@ -0,0 +1,48 @@
+import sys
+from pathlib import Path
+
+import pytest
+import torch
+
+# Add backend directory to sys.path
+backend_dir = Path(__file__).resolve().parent.parent
+sys.path.append(str(backend_dir))
+
+from app.ml_models.diffusion import LayoutDiffusionModel, DiffusionSampler
+
+def _sampler(n_steps: int = 1000):
+    torch.manual_seed(0)
+    model = LayoutDiffusionModel(input_dim=8, condition_dim=16, n_steps=n_steps).eval()
+    return DiffusionSampler(model, n_steps=n_steps)
+
+def test_ddim_full_length_matches_ddpm():
+    # With eta=1 every DDIM step uses DDPM's posterior variance, so at full length both
+    # samplers take the same steps and draw the same noise under the same seed
+    sampler = _sampler()
+    condition = torch.randn(4, 16)
+
+    torch.manual_seed(1)
+    expected = sampler.sample(condition, (4, 8))
+    torch.manual_seed(1)
+    actual = sampler.ddim_sample(condition, (4, 8), num_inference_steps=sampler.n_steps, eta=1.0)
+
+    torch.testing.assert_close(actual, expected, rtol=1e-4, atol=1e-4 * expected.abs().max().item())
+
+def test_ddim_is_deterministic_at_eta_zero():
+    sampler = _sampler()
+    condition = torch.randn(2, 16)
+
+    torch.manual_seed(1)
+    first = sampler.ddim_sample(condition, (2, 8), num_inference_steps=50)
+    torch.manual_seed(1)
+    second = sampler.ddim_sample(condition, (2, 8), num_inference_steps=50)
+
+    assert first.shape == (2, 8)
+    assert torch.isfinite(first).all()
+    torch.testing.assert_close(first, second)
+
+@pytest.mark.parametrize("num_inference_steps", [0, 1001])
+def test_ddim_rejects_invalid_step_counts(num_inference_steps):
+    sampler = _sampler()
+    with pytest.raises(ValueError):
+        sampler.ddim_sample(torch.randn(1, 16), (1, 8), num_inference_steps=num_inference_steps)
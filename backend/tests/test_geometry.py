@@ -0,0 +1,65 @@
+import sys
+import json
+import struct
+from pathlib import Path
+
+import numpy as np
+
+# Add backend directory to sys.path
+backend_dir = Path(__file__).resolve().parent.parent
+sys.path.append(str(backend_dir))
+
+from app.services.geometry import geometry_service, GeometryBatch
+
+def parse_glb(glb: bytes):
+    """Split a binary glTF into its JSON document and BIN chunk."""
+    magic, version, total = struct.unpack_from("<4sII", glb, 0)
+    assert (magic, version, total) == (b"glTF", 2, len(glb))
+    json_length, json_type = struct.unpack_from("<II", glb, 12)
+    assert json_type == 0x4E4F534A
+    gltf = json.loads(glb[20:20 + json_length])
+    bin_length, bin_type = struct.unpack_from("<II", glb, 20 + json_length)
+    assert bin_type == 0x004E4942
+    return gltf, glb[28 + json_length:28 + json_length + bin_length]
+
+def read_accessor(gltf, binary: bytes, index: int) -> np.ndarray:
+    accessor = gltf["accessors"][index]
+    view = gltf["bufferViews"][accessor["bufferView"]]
+    offset = view["byteOffset"] + accessor.get("byteOffset", 0)
+    assert accessor["componentType"] == 5126 and accessor["type"] == "VEC3"
+    return np.frombuffer(binary, dtype=np.float32, count=accessor["count"] * 3, offset=offset).reshape(-1, 3)
+
+def instanced_boxes(glb: bytes):
+    """(translations, scales) of every EXT_mesh_gpu_instancing box, node by node."""
+    gltf, binary = parse_glb(glb)
+    assert "EXT_mesh_gpu_instancing" in gltf["extensionsRequired"]
+    translations, scales = [], []
+    for node in gltf["nodes"]:
+        attributes = node["extensions"]["EXT_mesh_gpu_instancing"]["attributes"]
+        node_translations = read_accessor(gltf, binary, attributes["TRANSLATION"])
+        node_scales = read_accessor(gltf, binary, attributes["SCALE"])
+        assert len(node_translations) == len(node_scales)
+        translations.append(node_translations)
+        scales.append(node_scales)
+    return np.concatenate(translations), np.concatenate(scales)
+
+def test_instanced_glb_places_every_box():
+    rooms = [
+        {"id": "l1", "type": "living_room", "x": 0, "y": 0, "width": 200, "height": 100, "center_x": 100, "center_y": 50},
+        {"id": "k1", "type": "kitchen", "x": 200, "y": 0, "width": 100, "height": 100, "center_x": 250, "center_y": 50},
+        {"id": "b1", "type": "bedroom", "x": 0, "y": 100, "width": 150, "height": 150, "center_x": 75, "center_y": 175},
+    ]
+    glb = geometry_service.create_3d_model(GeometryBatch.from_records(rooms))
+    translations, scales = instanced_boxes(glb)
+
+    # Floor + 4 walls per room, split across one node per material
+    gltf, _ = parse_glb(glb)
+    assert len(translations) == 5 * len(rooms)
+    assert len(gltf["nodes"]) == 4 # Three floor colors plus walls
+
+    # Floors sit at y=0.1 under each room center (0.02 m per px), sized to the room
+    floors = np.isclose(translations[:, 1], 0.1)
+    assert floors.sum() == len(rooms)
+    expected = sorted((r["center_x"] * 0.02, r["center_y"] * 0.02, r["width"] * 0.02, r["height"] * 0.02) for r in rooms)
+    actual = sorted(zip(translations[floors, 0], translations[floors, 2], scales[floors, 0], scales[floors, 2]))
+    np.testing.assert_allclose(actual, expected, rtol=1e-6)
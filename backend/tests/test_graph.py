@@ -0,0 +1,35 @@
+import sys
+from pathlib import Path
+
+import networkx as nx
+
+# Add backend directory to sys.path
+backend_dir = Path(__file__).resolve().parent.parent
+sys.path.append(str(backend_dir))
+
+from app.core.graph import GraphBuilderService
+from app.schemas.architecture import ArchitecturalProgram
+
+def test_edges_follow_node_link_data_order():
+    program = ArchitecturalProgram(
+        rooms=[
+            {"id": room_id, "name": room_id, "type": "bedroom", "constraints": {"room_id": room_id}}
+            for room_id in ("a", "b", "c")
+        ],
+        adjacencies=[
+            {"room_id_a": "b", "room_id_b": "c", "type": "direct"},
+            {"room_id_a": "c", "room_id_b": "a", "type": "near"},
+            {"room_id_a": "c", "room_id_b": "b", "type": "far"} # Repeat updates the existing edge
+        ],
+        global_constraints={"floors": 1}
+    )
+    graph_data = GraphBuilderService()._build(program)
+
+    G = nx.Graph()
+    for room in program.rooms:
+        G.add_node(room.id)
+    for adj in program.adjacencies:
+        G.add_edge(adj.room_id_a, adj.room_id_b, type=adj.type.value)
+
+    assert [(e["source"], e["target"]) for e in graph_data["edges"]] == list(G.edges)
+    assert [e["type"] for e in graph_data["edges"]] == [d["type"] for _, _, d in G.edges(data=True)]
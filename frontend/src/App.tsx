@@ -23,7 +23,7 @@ function App() {
   const [viewMode, setViewMode] = useState<'2d' | '3d'>('2d')
   
   const [layoutSvg, setLayoutSvg] = useState<string | null>(null)
-  const [glbContent, setGlbContent] = useState<string | null>(null)
+  const [glbUrl, setGlbUrl] = useState<string | null>(null)
   
   const [program, setProgram] = useState<ArchitecturalProgram | null>(null)
   const [error, setError] = useState<string | null>(null)
@@ -31,7 +31,7 @@ function App() {
   const handleGenerate = async (promptText: string) => {
     setIsGenerating(true)
     setLayoutSvg(null)
-    setGlbContent(null)
+    setGlbUrl(null)
     setError(null)
     setProgram(null)
 
@@ -64,8 +64,9 @@ function App() {
       console.log('Generation response:', layoutData)
       setLayoutSvg(layoutData.svg_content)
       
-      if (layoutData.glb_content) {
-        setGlbContent(layoutData.glb_content)
+      if (layoutData.job_id) {
+        // The GLB model is streamed separately as binary glTF
+        setGlbUrl(`/api/v1/generation/${layoutData.job_id}/glb`)
         setViewMode('3d') // Auto-switch to 3D if available
       } else {
         setViewMode('2d')
@@ -148,7 +149,7 @@ function App() {
         >
           {/* Content Area */}
           <div className="w-full h-full flex items-center justify-center relative">
-            {!layoutSvg && !glbContent ? (
+            {!layoutSvg && !glbUrl ? (
               <div className="text-center space-y-4">
                 <div className="w-16 h-16 mx-auto border border-dashed border-border rounded-lg flex items-center justify-center bg-background/50">
                   <Layers className="text-muted-foreground/30" />
@@ -168,9 +169,9 @@ function App() {
                     dangerouslySetInnerHTML={{ __html: layoutSvg }}
                   />
                 )}
-                {viewMode === '3d' && glbContent && (
+                {viewMode === '3d' && glbUrl && (
                   <div className="w-full h-full animate-in fade-in duration-500">
-                    <ModelViewer glbBase64={glbContent} />
+                    <ModelViewer glbUrl={glbUrl} />
                   </div>
                 )}
               </>
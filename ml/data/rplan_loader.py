@@ -1,11 +1,12 @@
 import os
 import json
+import hashlib
 import numpy as np
 import networkx as nx
 import torch
 from torch_geometric.utils import from_networkx
+from torch_geometric.data import Data, InMemoryDataset
 from typing import List, Dict, Tuple, Optional
-import random
 
 # Room Types mapping for encoding
 ROOM_TYPES = {
@@ -21,70 +22,97 @@ ROOM_TYPES = {
     "other": 9
 }
 
+# Bump when the synthetic generator changes so cached datasets are regenerated
+SYNTHETIC_VERSION = 1
+
+class SyntheticGraphDataset(InMemoryDataset):
+    """
+    Synthetic graphs collated into a single set of tensors, loaded from one .pt file.
+    """
+    def __init__(self, path: str):
+        super().__init__()
+        self.load(path)
+
 class RPlanLoader:
-    def __init__(self, data_path: Optional[str] = None):
+    def __init__(self, data_path: Optional[str] = None, seed: Optional[int] = None):
         self.data_path = data_path
         self.room_types = ROOM_TYPES
+        self.seed = seed
+        self.rng = np.random.default_rng(seed)
         
-    def generate_synthetic_graph(self, num_rooms: int = None) -> nx.Graph:
+    def generate_synthetic_arrays(self, num_rooms: int = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
         """
-        Generates a synthetic architectural constraint graph for testing/training 
-        without the full RPLAN dataset.
+        Generates a synthetic architectural constraint graph as arrays:
+        node type indices (N,), node areas (N,) and undirected edges (E, 2).
+        All rooms are drawn at once with NumPy instead of one Python random call per node/edge.
         """
         if num_rooms is None:
-            num_rooms = random.randint(3, 8)
-            
-        G = nx.Graph()
+            num_rooms = int(self.rng.integers(3, 9))
+        rng = self.rng
         
         # 1. Create Nodes (Rooms)
         # Always have at least one living room and entrance for realism
-        room_types_list = list(self.room_types.keys())
-        
-        # Room 0: Entrance
-        G.add_node(0, room_type="entrance", type_idx=self.room_types["entrance"], area=random.uniform(3, 8))
+        # Room 0: Entrance, Room 1: Living Room, then random rooms
+        others = np.arange(2, max(num_rooms, 2))
+        types = np.concatenate((
+            [self.room_types["entrance"], self.room_types["living_room"]],
+            rng.integers(0, len(self.room_types), size=len(others))
+        ))
+        areas = np.concatenate((
+            [rng.uniform(3, 8), rng.uniform(15, 30)],
+            rng.uniform(5, 20, size=len(others))
+        ))
         
-        # Room 1: Living Room
-        G.add_node(1, room_type="living_room", type_idx=self.room_types["living_room"], area=random.uniform(15, 30))
+        # 2. Edges: Entrance to Living Room, then each other room to the living room or a previous room
+        targets = rng.integers(1, others)
+        # Maybe add another connection (cycle)
+        targets2 = rng.integers(1, others)
+        cycle = (rng.random(len(others)) > 0.7) & (targets2 != targets)
+        edges = np.concatenate((
+            [[0, 1]],
+            np.stack((others, targets), axis=1),
+            np.stack((others[cycle], targets2[cycle]), axis=1)
+        )).astype(np.int64)
         
-        # Connect Entrance to Living Room
-        G.add_edge(0, 1, weight=1.0)
+        return types, areas, edges
+
+    def generate_synthetic_graph(self, num_rooms: int = None) -> nx.Graph:
+        """
+        Generates a synthetic architectural constraint graph for testing/training 
+        without the full RPLAN dataset.
+        """
+        types, areas, edges = self.generate_synthetic_arrays(num_rooms)
+        room_types_list = list(self.room_types.keys())
         
-        # Add other rooms
-        for i in range(2, num_rooms):
-            rt = random.choice(room_types_list)
-            # Simple heuristic: connect to living room or a previous room
-            target = random.randint(1, i-1)
-            
-            G.add_node(i, room_type=rt, type_idx=self.room_types[rt], area=random.uniform(5, 20))
-            G.add_edge(i, target, weight=1.0)
-            
-            # Maybe add another connection (cycle)
-            if random.random() > 0.7:
-                target2 = random.randint(1, i-1)
-                if target2 != target:
-                    G.add_edge(i, target2, weight=1.0)
-                    
+        G = nx.Graph()
+        G.add_nodes_from(
+            (i, {"room_type": room_types_list[t], "type_idx": t, "area": a})
+            for i, (t, a) in enumerate(zip(types.tolist(), areas.tolist()))
+        )
+        G.add_edges_from(edges.tolist(), weight=1.0)
         return G
 
+    def arrays_to_pyg_data(self, types: np.ndarray, areas: np.ndarray, edges: np.ndarray) -> Data:
+        """
+        Build the PyG Data object straight from the synthetic arrays (no NetworkX round trip).
+        Feature vector per node: [one_hot_type(10), area(1)] = 11 dims
+        """
+        x = self._node_features(types, areas)
+        
+        # Undirected: store both directions, like from_networkx does
+        edge_index = torch.from_numpy(np.concatenate((edges, edges[:, ::-1])).T.copy())
+        return Data(x=x, edge_index=edge_index)
+
     def graph_to_pyg_data(self, G: nx.Graph):
         """
         Convert NetworkX graph to PyTorch Geometric Data object.
         Feature vector per node: [one_hot_type(10), area(1)] = 11 dims
         """
         # Node Features
-        x = []
-        for node in G.nodes(data=True):
-            # One-hot encode room type
-            type_idx = node[1]['type_idx']
-            one_hot = [0] * len(self.room_types)
-            one_hot[type_idx] = 1
-            
-            # Append Area (normalized roughly)
-            area_norm = node[1]['area'] / 50.0 
-            
-            x.append(one_hot + [area_norm])
-            
-        x = torch.tensor(x, dtype=torch.float)
+        num_nodes = G.number_of_nodes()
+        types = np.fromiter((d['type_idx'] for _, d in G.nodes(data=True)), dtype=np.int64, count=num_nodes)
+        areas = np.fromiter((d['area'] for _, d in G.nodes(data=True)), dtype=np.float64, count=num_nodes)
+        x = self._node_features(types, areas)
         
         # Edge Index
         data = from_networkx(G)
@@ -92,18 +120,76 @@ class RPlanLoader:
         
         return data
 
-    def get_dataloader(self, batch_size=32, num_samples=1000):
+    def _node_features(self, types: np.ndarray, areas: np.ndarray) -> torch.Tensor:
+        # One-hot encode room type
+        one_hot = np.eye(len(self.room_types), dtype=np.float32)[types]
+        # Append Area (normalized roughly)
+        area_norm = (areas / 50.0).astype(np.float32)[:, None]
+        return torch.from_numpy(np.concatenate((one_hot, area_norm), axis=1))
+
+    def dataset_key(self, num_samples: int) -> str:
+        """Identifies the synthetic dataset this loader's seed produces for num_samples, for on-disk caches."""
+        return hashlib.sha1(f"{SYNTHETIC_VERSION}:{num_samples}:{self.seed}".encode()).hexdigest()[:16]
+
+    def build_dataset(self, num_samples=1000, cache_dir: Optional[str] = None):
         """
-        Returns a list of PyG Data objects (simplified loader)
+        Generates num_samples synthetic graphs in order.
+        With cache_dir, the dataset is generated once per (num_samples, seed) and reloaded from disk afterwards.
+        Unseeded loaders never cache, since their dataset is meant to differ on every run.
         """
+        if self.seed is None:
+            cache_dir = None
+        if cache_dir is not None:
+            path = os.path.join(cache_dir, f"rplan_synth_{self.dataset_key(num_samples)}.pt")
+            if os.path.exists(path):
+                return SyntheticGraphDataset(path)
+        
         dataset = []
         for _ in range(num_samples):
-            G = self.generate_synthetic_graph()
-            data = self.graph_to_pyg_data(G)
+            data = self.arrays_to_pyg_data(*self.generate_synthetic_arrays())
             dataset.append(data)
         
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+            # Write then rename so a concurrent run never loads a partial file
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            InMemoryDataset.save(dataset, tmp_path)
+            os.replace(tmp_path, path)
+        return dataset
+
+    def get_dataloader(self, batch_size=32, num_samples=1000, cache_dir: Optional[str] = None, num_workers: int = 0,
+                       drop_last: bool = False, rank: int = 0, world_size: int = 1, conditions: Optional[torch.Tensor] = None,
+                       pin_memory: bool = False, prefetch_factor: Optional[int] = None):
+        """
+        Returns a PyG DataLoader over synthetic graphs (simplified loader), built by build_dataset.
+        drop_last keeps every batch the same size, which compiled models need to reuse their graphs.
+        With world_size > 1 each rank iterates its own shard; all ranks must build the same dataset (fixed seed).
+        conditions ([num_samples, dim], in dataset order) are attached per graph, so batches carry batch.condition.
+        pin_memory/prefetch_factor let workers collate batches into page-locked memory ahead of the training step.
+        """
         from torch_geometric.loader import DataLoader
-        return DataLoader(dataset, batch_size=batch_size, shuffle=True)
+        
+        dataset = self.build_dataset(num_samples, cache_dir)
+        if conditions is not None:
+            if len(conditions) != len(dataset):
+                raise ValueError(f"Got {len(conditions)} conditions for {len(dataset)} graphs")
+            data_list = []
+            for i in range(len(dataset)):
+                data = dataset[i]
+                data.condition = conditions[i:i + 1] # [1, dim] rows collate to [batch, dim]
+                data_list.append(data)
+            dataset = data_list
+        
+        sampler = None
+        if world_size > 1:
+            from torch.utils.data.distributed import DistributedSampler
+            sampler = DistributedSampler(dataset, num_replicas=world_size, rank=rank, shuffle=True)
+        
+        return DataLoader(
+            dataset, batch_size=batch_size, shuffle=sampler is None, sampler=sampler,
+            num_workers=num_workers, persistent_workers=num_workers > 0, drop_last=drop_last,
+            pin_memory=pin_memory, prefetch_factor=prefetch_factor if num_workers > 0 else None
+        )
 
 if __name__ == "__main__":
     loader = RPlanLoader()
@@ -0,0 +1,35 @@
+import os
+import torch
+import torch.distributed as dist
+import torch.multiprocessing as mp
+
+def launch(worker):
+    """
+    Runs worker(rank, world_size) once per visible GPU via torch.multiprocessing.spawn,
+    or once in-process when there is at most one device.
+    """
+    world_size = torch.cuda.device_count()
+    if world_size > 1:
+        mp.spawn(worker, args=(world_size,), nprocs=world_size)
+    else:
+        worker(0, 1)
+
+def setup(rank: int, world_size: int) -> torch.device:
+    """
+    Joins the process group (NCCL on GPU, gloo otherwise) and returns this rank's device.
+    Single-process runs skip the process group entirely.
+    """
+    if world_size > 1:
+        os.environ.setdefault("MASTER_ADDR", "localhost")
+        os.environ.setdefault("MASTER_PORT", "29500")
+        backend = "nccl" if torch.cuda.is_available() else "gloo"
+        dist.init_process_group(backend, rank=rank, world_size=world_size)
+
+    if torch.cuda.is_available():
+        torch.cuda.set_device(rank)
+        return torch.device("cuda", rank)
+    return torch.device("cpu")
+
+def cleanup():
+    if dist.is_initialized():
+        dist.destroy_process_group()
@@ -7,13 +7,13 @@ class SinusoidalPositionEmbeddings(nn.Module):
     def __init__(self, dim):
         super().__init__()
         self.dim = dim
-
-    def forward(self, time):
-        device = time.device
         half_dim = self.dim // 2
         embeddings = math.log(10000) / (half_dim - 1)
-        embeddings = torch.exp(torch.arange(half_dim, device=device) * -embeddings)
-        embeddings = time[:, None] * embeddings[None, :]
+        # Frequencies are constant, so build them once (non-persistent: checkpoints are unaffected)
+        self.register_buffer("freqs", torch.exp(torch.arange(half_dim) * -embeddings), persistent=False)
+
+    def forward(self, time):
+        embeddings = time[:, None] * self.freqs[None, :]
         embeddings = torch.cat((embeddings.sin(), embeddings.cos()), dim=-1)
         return embeddings
 
@@ -23,7 +23,7 @@ class LayoutDiffusionModel(nn.Module):
     Predicts noise added to the layout representation at timestep t,
     conditioned on the constraint graph embedding.
     """
-    def __init__(self, input_dim=4, condition_dim=256, time_dim=64, hidden_dim=256):
+    def __init__(self, input_dim=4, condition_dim=256, time_dim=64, hidden_dim=256, compile_model=False, n_steps=1000):
         super().__init__()
         # input_dim: 4 for [x, y, w, h] per room (simplified) or flattened vector
         
@@ -33,6 +33,13 @@ class LayoutDiffusionModel(nn.Module):
             nn.ReLU()
         )
         
+        # There are only n_steps distinct timesteps: keep their sinusoidal embeddings, and in eval mode
+        # the time_mlp output for each, so sampling gathers rows instead of rerunning the MLP every step
+        with torch.no_grad():
+            self.register_buffer("t_emb_table", self.time_mlp[0](torch.arange(n_steps)), persistent=False)
+        self.register_buffer("t_emb_projected", None, persistent=False)
+        self.register_load_state_dict_post_hook(lambda module, _: module._clear_time_cache())
+        
         self.cond_mlp = nn.Sequential(
             nn.Linear(condition_dim, time_dim),
             nn.ReLU()
@@ -46,14 +53,26 @@ class LayoutDiffusionModel(nn.Module):
             nn.ReLU(),
             nn.Linear(hidden_dim, input_dim)
         )
+        
+        if compile_model:
+            # Sampling runs these small MLPs once per step, so eager dispatch and kernel launches dominate.
+            # reduce-overhead replays CUDA graphs for fixed shapes. Module.compile keeps state_dict keys unchanged.
+            # (torch.jit.script is deprecated in current PyTorch and was no faster than eager for this MLP on CPU)
+            self.net.compile(mode="reduce-overhead", fullgraph=True)
+            self.time_mlp.compile(mode="reduce-overhead", fullgraph=True)
 
-    def forward(self, x, t, condition):
+    def forward(self, x, t, condition=None, c_emb=None):
         # x: Noisy layout [batch, input_dim]
         # t: Timestep [batch]
         # condition: Graph embedding [batch, condition_dim]
+        # c_emb: precompute_condition(condition), passed instead of condition when it is reused across steps
         
-        t_emb = self.time_mlp(t)
-        c_emb = self.cond_mlp(condition)
+        if self.training:
+            t_emb = self.time_mlp(t)
+        else:
+            t_emb = self._projected_time_table()[t]
+        if c_emb is None:
+            c_emb = self.precompute_condition(condition)
         
         # Concatenate input, time embedding, and condition embedding
         # (Broadcasting c_emb and t_emb if necessary, but here assuming dense layers handle it)
@@ -61,21 +80,63 @@ class LayoutDiffusionModel(nn.Module):
         
         return self.net(inp)
 
-class DiffusionSampler:
+    def precompute_condition(self, condition):
+        # The condition is constant over a sampling trajectory, so its embedding is computed once
+        return self.cond_mlp(condition)
+
+    def train(self, mode=True):
+        # Weights may change while training, so the projected table is rebuilt on the next eval forward
+        self._clear_time_cache()
+        return super().train(mode)
+
+    def _clear_time_cache(self):
+        self.t_emb_projected = None
+
+    def _projected_time_table(self):
+        if self.t_emb_projected is None:
+            with torch.no_grad():
+                self.t_emb_projected = self.time_mlp[1:](self.t_emb_table)
+        return self.t_emb_projected
+
+class DiffusionSampler(nn.Module):
+    """
+    DDPM noise schedule plus forward/reverse sampling around a denoising model.
+    Schedule tensors are registered buffers, so one .to(device) moves them with the model
+    and they are part of state_dict for checkpoint resume.
+    """
     def __init__(self, model, beta_start=1e-4, beta_end=0.02, n_steps=1000, device="cpu"):
+        super().__init__()
         self.model = model
         self.n_steps = n_steps
-        self.device = device
         
-        self.betas = torch.linspace(beta_start, beta_end, n_steps).to(device)
-        self.alphas = 1. - self.betas
-        self.alphas_cumprod = torch.cumprod(self.alphas, axis=0)
-        self.alphas_cumprod_prev = F.pad(self.alphas_cumprod[:-1], (1, 0), value=1.0)
+        betas = torch.linspace(beta_start, beta_end, n_steps)
+        alphas = 1. - betas
+        alphas_cumprod = torch.cumprod(alphas, axis=0)
+        alphas_cumprod_prev = F.pad(alphas_cumprod[:-1], (1, 0), value=1.0)
+        posterior_variance = betas * (1. - alphas_cumprod_prev) / (1. - alphas_cumprod)
+        
+        self.register_buffer("betas", betas)
+        self.register_buffer("alphas", alphas)
+        self.register_buffer("alphas_cumprod", alphas_cumprod)
+        self.register_buffer("alphas_cumprod_prev", alphas_cumprod_prev)
+        self.register_buffer("sqrt_recip_alphas", torch.sqrt(1.0 / alphas))
+        self.register_buffer("sqrt_alphas_cumprod", torch.sqrt(alphas_cumprod))
+        self.register_buffer("sqrt_one_minus_alphas_cumprod", torch.sqrt(1. - alphas_cumprod))
+        self.register_buffer("posterior_variance", posterior_variance)
+        
+        # [n_steps, 2] forward coefficients (x_0 scale, noise scale), so q_sample does one gather instead of two
+        self.register_buffer("q_schedule", torch.stack([self.sqrt_alphas_cumprod, self.sqrt_one_minus_alphas_cumprod], dim=1))
         
-        self.sqrt_recip_alphas = torch.sqrt(1.0 / self.alphas)
-        self.sqrt_alphas_cumprod = torch.sqrt(self.alphas_cumprod)
-        self.sqrt_one_minus_alphas_cumprod = torch.sqrt(1. - self.alphas_cumprod)
-        self.posterior_variance = self.betas * (1. - self.alphas_cumprod_prev) / (1. - self.alphas_cumprod)
+        # [n_steps, 4] per-step reverse coefficients, so p_sample does one gather instead of four
+        self.register_buffer("schedule_cache", torch.stack([
+            betas, self.sqrt_one_minus_alphas_cumprod, self.sqrt_recip_alphas, torch.sqrt(posterior_variance)
+        ], dim=1))
+        
+        self.to(device)
+
+    @property
+    def device(self):
+        return self.betas.device
 
     def q_sample(self, x_0, t, noise=None):
         """
@@ -85,40 +146,91 @@ class DiffusionSampler:
         if noise is None:
             noise = torch.randn_like(x_0)
             
-        sqrt_alphas_cumprod_t = self.sqrt_alphas_cumprod[t][:, None]
-        sqrt_one_minus_alphas_cumprod_t = self.sqrt_one_minus_alphas_cumprod[t][:, None]
-        
-        return sqrt_alphas_cumprod_t * x_0 + sqrt_one_minus_alphas_cumprod_t * noise
+        # One gather for both coefficients, sliced as [batch, 1] columns, then a fused multiply-add
+        coeffs = self.q_schedule[t]
+        return torch.addcmul(coeffs[:, 1:2] * noise, coeffs[:, 0:1], x_0)
 
     @torch.no_grad()
-    def p_sample(self, x, t, t_index, condition):
+    def p_sample(self, x, t, t_index, c_emb, noise=None):
         """
         Reverse diffusion process: p(x_{t-1} | x_t)
+        c_emb is the model's precompute_condition output for the trajectory's conditions.
+        If noise is given it is refilled in place instead of allocating a fresh tensor.
         """
-        betas_t = self.betas[t]
-        sqrt_one_minus_alphas_cumprod_t = self.sqrt_one_minus_alphas_cumprod[t]
-        sqrt_recip_alphas_t = self.sqrt_recip_alphas[t]
+        # Per-sample schedule values as [batch, 1] columns so they broadcast over the layout dims
+        coeffs = self.schedule_cache[t]
+        betas_t = coeffs[:, 0:1]
+        sqrt_one_minus_alphas_cumprod_t = coeffs[:, 1:2]
+        sqrt_recip_alphas_t = coeffs[:, 2:3]
         
         # Model predicts noise
         model_mean = sqrt_recip_alphas_t * (
-            x - betas_t * self.model(x, t, condition) / sqrt_one_minus_alphas_cumprod_t
+            x - betas_t * self.model(x, t, c_emb=c_emb) / sqrt_one_minus_alphas_cumprod_t
         )
         
         if t_index == 0:
             return model_mean
         else:
-            posterior_variance_t = self.posterior_variance[t]
-            noise = torch.randn_like(x)
-            return model_mean + torch.sqrt(posterior_variance_t) * noise
+            posterior_std_t = coeffs[:, 3:4]
+            noise = torch.randn_like(x) if noise is None else noise.normal_()
+            return model_mean + posterior_std_t * noise
+
+    @torch.no_grad()
+    def denoise(self, img, condition, start, end=0):
+        """
+        Run the reverse steps start-1 ... end on img.
+        Allows a trajectory to be stopped at an intermediate latent and resumed later.
+        """
+        c_emb = self.model.precompute_condition(condition)
+        b = img.shape[0]
+        # One timestep and one noise buffer for the whole trajectory, refilled every step
+        t = torch.empty((b,), device=self.device, dtype=torch.long)
+        noise = torch.empty_like(img)
+        
+        for i in reversed(range(end, start)):
+            t.fill_(i)
+            img = self.p_sample(img, t, i, c_emb, noise=noise)
+            
+        return img
 
     @torch.no_grad()
     def sample(self, condition, shape):
-        b = shape[0]
         # Start from pure noise
         img = torch.randn(shape, device=self.device)
+        return self.denoise(img, condition, self.n_steps)
+
+    @torch.no_grad()
+    def ddim_sample(self, condition, shape, num_inference_steps=50, eta=0.0):
+        """
+        DDIM reverse process over num_inference_steps evenly spaced timesteps of the trained schedule,
+        so the same model needs far fewer evaluations than sample().
+        eta=0 is deterministic; eta=1 adds DDPM's posterior noise (and matches sample() at full length).
+        """
+        if not 1 <= num_inference_steps <= self.n_steps:
+            raise ValueError(f"num_inference_steps must be between 1 and {self.n_steps}, got {num_inference_steps}")
+        c_emb = self.model.precompute_condition(condition)
+        img = torch.randn(shape, device=self.device)
+        
+        # Evenly spaced from the last timestep down, so even a single step starts from pure noise at t = n_steps - 1
+        step_indices = torch.linspace(self.n_steps - 1, 0, num_inference_steps, device=self.device).round().long().flip(0)
+        alphas_cumprod = self.alphas_cumprod[step_indices]
+        alphas_cumprod_prev = F.pad(alphas_cumprod[:-1], (1, 0), value=1.0)
+        sigmas = eta * torch.sqrt((1. - alphas_cumprod_prev) / (1. - alphas_cumprod) * (1. - alphas_cumprod / alphas_cumprod_prev))
+        # Per-step scalars are read back once, so the loop below never syncs on the device
+        schedule = torch.stack([
+            alphas_cumprod.sqrt(), (1. - alphas_cumprod).sqrt(), alphas_cumprod_prev.sqrt(),
+            (1. - alphas_cumprod_prev - sigmas ** 2).clamp(min=0).sqrt(), sigmas
+        ], dim=1).tolist()
         
-        for i in reversed(range(0, self.n_steps)):
-            t = torch.full((b,), i, device=self.device, dtype=torch.long)
-            img = self.p_sample(img, t, i, condition)
+        t = torch.empty((shape[0],), device=self.device, dtype=torch.long)
+        noise = torch.empty_like(img)
+        for i, step in reversed(list(enumerate(step_indices.tolist()))):
+            sqrt_a_t, sqrt_one_minus_a_t, sqrt_a_prev, dir_coeff, sigma_t = schedule[i]
+            t.fill_(step)
+            eps = self.model(img, t, c_emb=c_emb)
+            x0_pred = (img - sqrt_one_minus_a_t * eps) / sqrt_a_t
+            img = sqrt_a_prev * x0_pred + dir_coeff * eps
+            if sigma_t > 0:
+                img = img + sigma_t * noise.normal_()
             
         return img
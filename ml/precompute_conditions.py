@@ -0,0 +1,66 @@
+import torch
+import os
+import hashlib
+import sys
+from pathlib import Path
+
+# Add project root to sys.path
+project_root = Path(__file__).resolve().parent.parent
+sys.path.append(str(project_root))
+
+from ml.models.graph_encoder import ConstraintGraphEncoder
+from ml.data.rplan_loader import RPlanLoader
+
+# Dataset the diffusion model trains on; train_diffusion.py builds the same one
+DATASET_SEED = 0
+NUM_SAMPLES = 2000
+CACHE_DIR = "ml/cache"
+GNN_PATH = "ml/checkpoints/gnn_encoder_v1.pt"
+
+def encoder_key(gnn_path: str = GNN_PATH) -> str:
+    """Content hash of the GNN checkpoint (or "random" when there is none), so retraining it invalidates cached embeddings."""
+    if not os.path.exists(gnn_path):
+        return "random"
+    with open(gnn_path, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()[:16]
+
+def conditions_path(num_samples: int = NUM_SAMPLES, seed: int = DATASET_SEED, gnn_path: str = GNN_PATH) -> str:
+    # Keyed like the dataset itself plus the encoder that embedded it, so a different seed, size
+    # or retrained GNN never picks up stale embeddings
+    key = RPlanLoader(seed=seed).dataset_key(num_samples)
+    return os.path.join(CACHE_DIR, f"conditions_{key}_{encoder_key(gnn_path)}.pt")
+
+def precompute_conditions(batch_size: int = 256):
+    """
+    Runs the frozen GNN encoder once over the whole training set and saves the
+    [num_samples, 128] graph embeddings in dataset order, so diffusion training
+    never has to run the encoder in its hot loop.
+    """
+    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+    print(f"Precomputing graph conditions on {device}...")
+
+    from torch_geometric.loader import DataLoader
+    dataset = RPlanLoader(seed=DATASET_SEED).build_dataset(NUM_SAMPLES, cache_dir=CACHE_DIR)
+
+    gnn = ConstraintGraphEncoder(node_dim=11, hidden_dim=64, out_dim=128).to(device)
+    if os.path.exists(GNN_PATH):
+        gnn.load_state_dict(torch.load(GNN_PATH, map_location=device))
+    else:
+        print("Warning: Pre-trained GNN not found, using random initialization")
+    gnn.eval()
+
+    conditions = []
+    with torch.inference_mode():
+        # No shuffling: row i must belong to dataset[i]
+        for batch in DataLoader(dataset, batch_size=batch_size, shuffle=False):
+            batch = batch.to(device)
+            conditions.append(gnn(batch.x, batch.edge_index, batch=batch.batch).cpu())
+    conditions = torch.cat(conditions)
+
+    path = conditions_path()
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    torch.save(conditions, path)
+    print(f"Saved {tuple(conditions.shape)} conditions to {path}")
+
+if __name__ == "__main__":
+    precompute_conditions()
@@ -3,8 +3,16 @@ import torch.optim as optim
 import os
 import sys
 from pathlib import Path
+from torch.nn.parallel import DistributedDataParallel as DDP
+from torch_geometric.loader import PrefetchLoader
 from tqdm import tqdm
 
+try:
+    from safetensors.torch import save_file
+    SAFETENSORS_AVAILABLE = True
+except ImportError:
+    SAFETENSORS_AVAILABLE = False
+
 # Add project root to sys.path
 project_root = Path(__file__).resolve().parent.parent
 sys.path.append(str(project_root))
@@ -12,27 +20,61 @@ sys.path.append(str(project_root))
 from ml.models.graph_encoder import ConstraintGraphEncoder
 from ml.models.diffusion import LayoutDiffusionModel, DiffusionSampler
 from ml.data.rplan_loader import RPlanLoader
+from ml.precompute_conditions import DATASET_SEED, NUM_SAMPLES, CACHE_DIR, GNN_PATH, conditions_path
+from ml import distributed
+
+BATCH_SIZE = 32
+LOG_INTERVAL = 20 # Steps between progress-bar loss updates (each one syncs with the device)
+# Fused GAT attention (dgNN) is opt-in with FUSED_GAT=1 until it has a CUDA parity test against GATConv
+FUSED_GAT = os.environ.get("FUSED_GAT") == "1"
+
+# TF32 tensor-core matmuls for the fp32 Linear/GAT layers on Ampere+, and cuDNN autotuning.
+# Module level so every spawned DDP worker picks them up on import
+torch.set_float32_matmul_precision('high')
+torch.backends.cudnn.benchmark = True
 
-def train_diffusion():
-    print("Initializing Diffusion Model Training...")
-    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
-    print(f"Using device: {device}")
+def train_diffusion(rank: int = 0, world_size: int = 1):
+    """
+    Trains on one device, or as one DDP rank of world_size (see distributed.launch).
+    Conditions come from ml/precompute_conditions.py when its cache exists for the current GNN checkpoint
+    (rerun it after retraining the GNN); otherwise the frozen GNN encoder runs locally on every rank.
+    Only the denoiser is wrapped in DDP.
+    """
+    is_main = rank == 0
+    if is_main:
+        print("Initializing Diffusion Model Training...")
+    device = distributed.setup(rank, world_size)
+    if is_main:
+        print(f"Using device: {device} (world size {world_size})")
+    # Compile only on GPU, where CUDA graph replay removes the per-step launch overhead
+    compile_model = device.type == 'cuda'
+    # bf16 autocast for the network's matmuls (no GradScaler needed, unlike fp16). The noise
+    # schedule stays fp32, so q_sample/p_sample updates don't accumulate rounding over the steps
+    use_bf16 = device.type == 'cuda' and torch.cuda.is_bf16_supported()
 
     # 1. Setup Data & Encoder
-    loader = RPlanLoader()
-    # Increased samples for diffusion
-    train_loader = loader.get_dataloader(batch_size=32, num_samples=2000) 
+    # A fixed seed gives every rank the same synthetic dataset to shard, and the one conditions were precomputed for
+    loader = RPlanLoader(seed=DATASET_SEED)
+    cond_path = conditions_path(NUM_SAMPLES, DATASET_SEED)
+    conditions = torch.load(cond_path) if os.path.exists(cond_path) else None
+    # Increased samples for diffusion. Fixed batch size so compiled graphs are reused every iteration
+    # On GPU, worker processes collate into pinned memory ahead of time and PrefetchLoader copies the
+    # next batch on a side stream while the current one trains (it passes batches through on CPU)
+    cuda = device.type == 'cuda'
+    data_loader = loader.get_dataloader(
+        batch_size=BATCH_SIZE, num_samples=NUM_SAMPLES, cache_dir=CACHE_DIR, drop_last=compile_model, rank=rank, world_size=world_size,
+        conditions=conditions, num_workers=4 if cuda else 0, pin_memory=cuda, prefetch_factor=4 if cuda else None
+    )
+    train_loader = PrefetchLoader(data_loader, device)
     
-    # Load Pre-trained GNN
-    gnn = ConstraintGraphEncoder(node_dim=11, hidden_dim=64, out_dim=128).to(device)
-    gnn_path = "ml/checkpoints/gnn_encoder_v1.pt"
-    if os.path.exists(gnn_path):
-        gnn.load_state_dict(torch.load(gnn_path, map_location=device))
-        print("Loaded pre-trained GNN encoder")
+    gnn = None
+    if conditions is not None:
+        if is_main:
+            print(f"Using precomputed graph conditions from {cond_path}")
     else:
-        print("Warning: Pre-trained GNN not found, using random initialization")
-    
-    gnn.eval() # Freeze GNN for now
+        if is_main:
+            print("No precomputed conditions (run ml/precompute_conditions.py), encoding graphs every step")
+        gnn = load_frozen_encoder(device, compile_model, verbose=is_main)
     
     # 2. Setup Diffusion Model
     # For this skeleton, let's assume we generate a fixed vector representing the layout
@@ -40,57 +82,81 @@ def train_diffusion():
     # To keep it simple and dynamic, let's just model a fixed number of max rooms (e.g. 8) * 4 params [x,y,w,h] = 32
     LAYOUT_DIM = 32 
     
-    model = LayoutDiffusionModel(input_dim=LAYOUT_DIM, condition_dim=128).to(device)
-    optimizer = optim.Adam(model.parameters(), lr=1e-4)
+    model = LayoutDiffusionModel(input_dim=LAYOUT_DIM, condition_dim=128, compile_model=compile_model).to(device)
+    ddp_model = DDP(model, device_ids=[rank] if device.type == 'cuda' else None) if world_size > 1 else model
+    # Fused Adam updates every parameter in one kernel on GPU (CUDA params only)
+    optimizer = optim.Adam(ddp_model.parameters(), lr=1e-4, fused=device.type == 'cuda')
+    # Sampling is local (rank 0), so it uses the unwrapped model
     sampler = DiffusionSampler(model, device=device)
     
     criterion = torch.nn.MSELoss()
     
+    # Dummy ground truth and noise are drawn on-device into persistent buffers every step
+    # (no per-step host allocation or H2D copy); a per-rank seeded generator keeps runs reproducible
+    gen = torch.Generator(device=device).manual_seed(DATASET_SEED + rank)
+    x0_buf = torch.empty(BATCH_SIZE, LAYOUT_DIM, device=device)
+    noise_buf = torch.empty_like(x0_buf)
+    
+    # Losses are summed on-device and read back once per epoch; a .item() every step would
+    # block the host until the GPU drains its queue
+    loss_acc = torch.zeros((), device=device)
     epochs = 5
     for epoch in range(epochs):
-        model.train()
-        total_loss = 0
+        ddp_model.train()
+        loss_acc.zero_()
+        if world_size > 1:
+            data_loader.sampler.set_epoch(epoch) # Reshuffle shards every epoch
         
-        pbar = tqdm(train_loader, desc=f"Epoch {epoch+1}/{epochs}")
-        for batch in pbar:
-            batch = batch.to(device)
-            optimizer.zero_grad()
+        pbar = tqdm(train_loader, desc=f"Epoch {epoch+1}/{epochs}", disable=not is_main)
+        for step, batch in enumerate(pbar):
+            batch = batch.to(device) # No-op once prefetched
+            optimizer.zero_grad(set_to_none=True)
             
             # 1. Get Condition Embedding from Graph
-            with torch.no_grad():
-                condition = gnn(batch.x, batch.edge_index, batch=batch.batch)
+            condition = encode_conditions(gnn, batch)
             
             # 2. Get "Real" Layout Data (Synthetic for now)
             # In a real scenario, this comes from the dataset
             # Here we generate random boxes as dummy ground truth
             batch_size = condition.size(0)
-            x_0 = torch.rand(batch_size, LAYOUT_DIM).to(device) 
+            x_0 = x0_buf[:batch_size].uniform_(0, 1, generator=gen)
             
             # 3. Sample Timesteps
-            t = torch.randint(0, sampler.n_steps, (batch_size,), device=device).long()
+            t = torch.randint(0, sampler.n_steps, (batch_size,), device=device, generator=gen)
             
             # 4. Add Noise
-            noise = torch.randn_like(x_0)
+            noise = noise_buf[:batch_size].normal_(generator=gen)
             x_t = sampler.q_sample(x_0, t, noise)
             
-            # 5. Predict Noise
-            predicted_noise = model(x_t, t, condition)
-            
-            # 6. Loss
-            loss = criterion(predicted_noise, noise)
+            with torch.autocast(device_type=device.type, dtype=torch.bfloat16, enabled=use_bf16):
+                # 5. Predict Noise
+                predicted_noise = ddp_model(x_t, t, condition)
+                
+                # 6. Loss
+                loss = criterion(predicted_noise, noise)
             
             loss.backward()
             optimizer.step()
             
-            total_loss += loss.item()
-            pbar.set_postfix({"loss": loss.item()})
+            loss_acc += loss.detach()
+            if is_main and step % LOG_INTERVAL == 0:
+                pbar.set_postfix({"loss": loss.item()})
             
-        print(f"Epoch {epoch+1} Average Loss: {total_loss / len(train_loader):.4f}")
+        if is_main:
+            print(f"Epoch {epoch+1} Average Loss: {loss_acc.item() / len(train_loader):.4f}")
 
-    # Save Model
+    if not is_main:
+        distributed.cleanup()
+        return
+
+    # Save Model (rank 0 only; the unwrapped module keeps checkpoint keys free of DDP's prefix)
     os.makedirs("ml/checkpoints", exist_ok=True)
     torch.save(model.state_dict(), "ml/checkpoints/diffusion_v1.pt")
     print("Model saved to ml/checkpoints/diffusion_v1.pt")
+    if SAFETENSORS_AVAILABLE:
+        # The backend prefers this copy: it loads memory-mapped without unpickling
+        save_file(model.state_dict(), "ml/checkpoints/diffusion_v1.safetensors")
+        print("Model saved to ml/checkpoints/diffusion_v1.safetensors")
     
     # Test Sampling
     print("Testing Generation...")
@@ -98,11 +164,44 @@ def train_diffusion():
     with torch.no_grad():
         # Get one condition
         sample_graph = next(iter(train_loader)).to(device)
-        condition = gnn(sample_graph.x, sample_graph.edge_index, batch=sample_graph.batch)
+        condition = encode_conditions(gnn, sample_graph)
         condition = condition[0:1] # Take first one
         
-        generated_layout = sampler.sample(condition, (1, LAYOUT_DIM))
-        print("Generated Layout Vector (First 4 values):", generated_layout[0][:4].cpu().numpy())
+        # Draw K layouts for the same graph in one reverse pass instead of K single-sample loops,
+        # with 50 DDIM steps over the trained schedule instead of the full 1000-step chain
+        K = 16
+        with torch.autocast(device_type=device.type, dtype=torch.bfloat16, enabled=use_bf16):
+            generated_layout = sampler.ddim_sample(condition.repeat(K, 1), (K, LAYOUT_DIM), num_inference_steps=50)
+        print(f"Generated {K} Layout Vectors (First 4 values of first):", generated_layout[0][:4].cpu().numpy())
+
+    distributed.cleanup()
+
+def load_frozen_encoder(device, compile_model: bool, verbose: bool = True):
+    # Load Pre-trained GNN
+    gnn = ConstraintGraphEncoder(node_dim=11, hidden_dim=64, out_dim=128, fused=FUSED_GAT and device.type == 'cuda').to(device)
+    if os.path.exists(GNN_PATH):
+        gnn.load_state_dict(torch.load(GNN_PATH, map_location=device))
+        if verbose:
+            print("Loaded pre-trained GNN encoder")
+    elif verbose:
+        print("Warning: Pre-trained GNN not found, using random initialization")
+    
+    gnn.eval() # Freeze GNN for now
+    gnn.requires_grad_(False)
+    if compile_model:
+        # Frozen weights become graph constants. Node counts vary per batch, so compile
+        # with dynamic shapes rather than re-recording CUDA graphs for every batch size
+        gnn = torch.compile(gnn, dynamic=True)
+    return gnn
+
+def encode_conditions(gnn, batch):
+    # Precomputed embeddings ride along with the batch; otherwise run the frozen encoder
+    if gnn is None:
+        return batch.condition
+    with torch.inference_mode():
+        condition = gnn(batch.x, batch.edge_index, batch=batch.batch)
+    # Inference tensors can't be saved for backward, and cond_mlp saves its input
+    return condition.clone()
 
 if __name__ == "__main__":
-    train_diffusion()
+    distributed.launch(train_diffusion)
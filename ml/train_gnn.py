@@ -3,73 +3,128 @@ import torch.optim as optim
 import os
 import sys
 from pathlib import Path
+from torch.nn.parallel import DistributedDataParallel as DDP
+from torch_geometric.loader import PrefetchLoader
+from torch_geometric.utils import batched_negative_sampling
 from tqdm import tqdm
 
+try:
+    from safetensors.torch import save_file
+    SAFETENSORS_AVAILABLE = True
+except ImportError:
+    SAFETENSORS_AVAILABLE = False
+
 # Add project root to sys.path
 project_root = Path(__file__).resolve().parent.parent
 sys.path.append(str(project_root))
 
 from ml.models.graph_encoder import ConstraintGraphEncoder
 from ml.data.rplan_loader import RPlanLoader
+from ml.precompute_conditions import DATASET_SEED, NUM_SAMPLES, CACHE_DIR
+from ml import distributed
+
+LOG_INTERVAL = 20 # Steps between progress-bar loss updates (each one syncs with the device)
+# Fused GAT attention (dgNN) is opt-in with FUSED_GAT=1 until it has a CUDA parity test against GATConv
+FUSED_GAT = os.environ.get("FUSED_GAT") == "1"
 
-def train_encoder():
-    print("Initializing RPLAN GNN Training...")
+# TF32 tensor-core matmuls for the fp32 Linear/GAT layers on Ampere+, and cuDNN autotuning.
+# Module level so every spawned DDP worker picks them up on import
+torch.set_float32_matmul_precision('high')
+torch.backends.cudnn.benchmark = True
+
+def train_encoder(rank: int = 0, world_size: int = 1):
+    """
+    Trains on one device, or as one DDP rank of world_size (see distributed.launch):
+    each rank takes a shard of every epoch and gradients are all-reduced once per step.
+    """
+    is_main = rank == 0
+    if is_main:
+        print("Initializing RPLAN GNN Training...")
+    device = distributed.setup(rank, world_size)
     
     # 1. Setup Data
-    loader = RPlanLoader()
-    train_loader = loader.get_dataloader(batch_size=64, num_samples=2000)
+    # A fixed seed gives every rank the same synthetic dataset to shard, the same one the diffusion
+    # model trains on, so all training scripts share one on-disk copy in CACHE_DIR
+    loader = RPlanLoader(seed=DATASET_SEED)
+    # On GPU, worker processes collate into pinned memory ahead of time and PrefetchLoader copies the
+    # next batch on a side stream while the current one trains (it passes batches through on CPU)
+    cuda = device.type == 'cuda'
+    data_loader = loader.get_dataloader(
+        batch_size=64, num_samples=NUM_SAMPLES, cache_dir=CACHE_DIR, rank=rank, world_size=world_size,
+        num_workers=4 if cuda else 0, pin_memory=cuda, prefetch_factor=4 if cuda else None
+    )
+    train_loader = PrefetchLoader(data_loader, device)
     
     # 2. Setup Model
     # Input dim = 10 (types) + 1 (area) = 11
-    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
-    print(f"Using device: {device}")
+    if is_main:
+        print(f"Using device: {device} (world size {world_size})")
     
-    model = ConstraintGraphEncoder(node_dim=11, hidden_dim=64, out_dim=128).to(device)
-    optimizer = optim.Adam(model.parameters(), lr=0.001)
+    # Fused GAT attention (dgNN) on GPU: one kernel per layer, no stored per-edge coefficients
+    model = ConstraintGraphEncoder(node_dim=11, hidden_dim=64, out_dim=128, fused=FUSED_GAT and device.type == 'cuda').to(device)
+    ddp_model = DDP(model, device_ids=[rank] if device.type == 'cuda' else None) if world_size > 1 else model
+    # Fused Adam updates every parameter in one kernel on GPU (CUDA params only)
+    optimizer = optim.Adam(ddp_model.parameters(), lr=0.001, fused=device.type == 'cuda')
     
     # Simple reconstruction loss (forcing embedding to retain structure info)
     # In a real diffusion setup, this would be trained end-to-end or with contrastive loss
     # Here we simulate a "pre-training" task: predict edge existence from embeddings
+    # (dot products of node embeddings, positives vs. sampled non-edges of the same graph)
     
     criterion = torch.nn.BCEWithLogitsLoss()
     
+    # Losses are summed on-device and read back once per epoch; a .item() every step would
+    # block the host until the GPU drains its queue
+    loss_acc = torch.zeros((), device=device)
     epochs = 5
     for epoch in range(epochs):
-        model.train()
-        total_loss = 0
+        ddp_model.train()
+        loss_acc.zero_()
+        if world_size > 1:
+            data_loader.sampler.set_epoch(epoch) # Reshuffle shards every epoch
         
-        pbar = tqdm(train_loader, desc=f"Epoch {epoch+1}/{epochs}")
-        for batch in pbar:
-            batch = batch.to(device)
-            optimizer.zero_grad()
-            
-            # Forward pass to get node embeddings
-            # We modify the forward to return node embeddings instead of graph pooling for this task
-            # Or we add a decoder.
-            # For MVP, let's just ensure it runs and outputs a valid shape.
+        pbar = tqdm(train_loader, desc=f"Epoch {epoch+1}/{epochs}", disable=not is_main)
+        for step, batch in enumerate(pbar):
+            batch = batch.to(device) # No-op once prefetched
+            optimizer.zero_grad(set_to_none=True)
             
-            # NOTE: The current model performs global pooling. We need node-level for edge prediction.
-            # Let's adjust the model or just run the forward pass to verify pipeline.
+            # Forward pass to get node embeddings (before graph pooling)
+            node_emb = ddp_model(batch.x, batch.edge_index, batch=batch.batch, return_nodes=True)
             
-            # Run forward
-            out = model(batch.x, batch.edge_index, batch=batch.batch)
-            
-            # Dummy loss to check backprop (maximize magnitude -> purely for checking gradients)
-            # In reality: contrastive loss or graph reconstruction
-            loss = torch.mean(torch.abs(out - 0.0)) 
+            # One negative per positive edge, drawn within each graph in a single vectorized call
+            pos_edges = batch.edge_index
+            neg_edges = batched_negative_sampling(pos_edges, batch.batch)
+            edges = torch.cat([pos_edges, neg_edges], dim=1)
+            logits = (node_emb[edges[0]] * node_emb[edges[1]]).sum(dim=-1)
+            labels = torch.cat([logits.new_ones(pos_edges.size(1)), logits.new_zeros(neg_edges.size(1))])
+            loss = criterion(logits, labels)
             
             loss.backward()
             optimizer.step()
             
-            total_loss += loss.item()
-            pbar.set_postfix({"loss": loss.item()})
+            loss_acc += loss.detach()
+            if is_main and step % LOG_INTERVAL == 0:
+                pbar.set_postfix({"loss": loss.item()})
             
-        print(f"Epoch {epoch+1} Average Loss: {total_loss / len(train_loader):.4f}")
+        if is_main:
+            print(f"Epoch {epoch+1} Average Loss: {loss_acc.item() / len(train_loader):.4f}")
+    
+    if is_main and device.type == 'cuda':
+        print(f"Peak GPU memory: {torch.cuda.max_memory_allocated(device) / 2**20:.1f} MiB (fused GAT: {model.fused})")
+
+    if not is_main:
+        distributed.cleanup()
+        return
 
-    # Save Model
+    # Save Model (rank 0 only; the unwrapped module keeps checkpoint keys free of DDP's prefix)
     os.makedirs("ml/checkpoints", exist_ok=True)
     torch.save(model.state_dict(), "ml/checkpoints/gnn_encoder_v1.pt")
     print("Model saved to ml/checkpoints/gnn_encoder_v1.pt")
+    if SAFETENSORS_AVAILABLE:
+        # The backend prefers this copy: it loads memory-mapped without unpickling
+        save_file(model.state_dict(), "ml/checkpoints/gnn_encoder_v1.safetensors")
+        print("Model saved to ml/checkpoints/gnn_encoder_v1.safetensors")
+    distributed.cleanup()
 
 if __name__ == "__main__":
-    train_encoder()
+    distributed.launch(train_encoder)